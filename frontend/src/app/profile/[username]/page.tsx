@@ -88,6 +88,7 @@ export default function ProfilePage({ params }: ProfileProps) {
       formData.append('file', file);
       
       const response = await api.post('/upload', formData, {
+        params: { kind: type },
         headers: {
           'Content-Type': 'multipart/form-data',
         },
@@ -29,6 +29,7 @@ interface RankEntry {
   username: string;
   display_name: string;
   avatar_url?: string;
+  avatar_variants?: Record<string, string>;
   games_won: number;
   total_score: number;
   best_streak: number;
@@ -405,7 +406,7 @@ export default function RankPage() {
                               <div className="w-10 h-10 rounded-full overflow-hidden bg-gradient-to-br from-primary-400 to-secondary-400 flex-shrink-0">
                                 {entry.avatar_url ? (
                                   <NextImage
-                                    src={entry.avatar_url}
+                                    src={entry.avatar_variants?.["64"] ?? entry.avatar_url}
                                     alt={entry.display_name}
                                     width={40}
                                     height={40}
@@ -23,6 +23,8 @@ interface UserSearchResult {
   display_name: string;
   avatar_url?: string;
   banner_url?: string;
+  avatar_variants?: Record<string, string>;
+  banner_variants?: Record<string, string>;
   games_won: number;
   total_score: number;
   in_game: boolean;
@@ -194,7 +196,7 @@ export default function UsersPage() {
                     <>
                       <div className="absolute inset-0">
                         <NextImage
-                          src={user.banner_url}
+                          src={user.banner_variants?.["640"] ?? user.banner_url}
                           alt={user.display_name}
                           fill
                           className="object-cover"
@@ -215,7 +217,7 @@ export default function UsersPage() {
                       <div className="w-16 h-16 rounded-full overflow-hidden bg-gradient-to-br from-primary-400 to-secondary-400 ring-2 ring-white dark:ring-gray-800 group-hover:ring-primary-400 dark:group-hover:ring-primary-600 transition-all">
                         {user.avatar_url ? (
                           <NextImage
-                            src={user.avatar_url}
+                            src={user.avatar_variants?.["64"] ?? user.avatar_url}
                             alt={user.display_name}
                             width={64}
                             height={64}
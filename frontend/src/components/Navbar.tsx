@@ -60,7 +60,7 @@ const ProfileCard: React.FC<ProfileCardProps> = ({
       <div className="relative h-20 rounded-xl overflow-hidden mb-4">
         {user_profile.banner_url ? (
           <NextImage
-            src={user_profile.banner_url}
+            src={user_profile.banner_variants?.["640"] ?? user_profile.banner_url}
             alt="Profile banner"
             className="w-full h-full object-cover"
             unoptimized
@@ -78,7 +78,7 @@ const ProfileCard: React.FC<ProfileCardProps> = ({
           <div className="w-full h-full rounded-full border border-surfacel-500 dark:border-surfaced-500 overflow-hidden bg-gray-200 dark:bg-gray-700 flex items-center justify-center relative">
             {user_profile.avatar_url ? (
               <NextImage
-                src={user_profile.avatar_url}
+                src={user_profile.avatar_variants?.["64"] ?? user_profile.avatar_url}
                 alt={displayName}
                 className="w-15 h-15"
                 unoptimized
@@ -411,7 +411,7 @@ export function Navbar() {
                         <div className="w-full h-full rounded-full border border-surfacel-500 dark:border-surfaced-500 overflow-hidden bg-gray-200 dark:bg-gray-700 flex items-center justify-center relative">
                           {user.avatar_url ? (
                             <NextImage
-                              src={user.avatar_url}
+                              src={user.avatar_variants?.["64"] ?? user.avatar_url}
                               alt={displayName}
                               className="w-8 h-8"
                               unoptimized
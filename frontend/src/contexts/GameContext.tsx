@@ -6,6 +6,7 @@ import {
   SetStateAction,
   useContext,
   useEffect,
+  useRef,
   useState,
 } from "react";
 import toast from "react-hot-toast";
@@ -60,6 +61,7 @@ export function GameProvider({ children }: { children: React.ReactNode }) {
     "selection"
   );
   const [lobbies, setLobbies] = useState<Lobby[]>([]);
+  const lobbiesVersion = useRef(0);
   const [currentLobby, setCurrentLobby] = useState<Lobby | null>(null);
   const [images, setImages] = useState<string[]>([]);
   const [ws, setWs] = useState<WebSocket | null>(null);
@@ -186,9 +188,36 @@ export function GameProvider({ children }: { children: React.ReactNode }) {
           setCurrentLobby(message.lobby);
           toast.success("It's your turn!");
           break;
-        case "new_lobby":
+        case "lobby_snapshot":
+          lobbiesVersion.current = message.version;
           setLobbies(message.public_lobbies);
           break;
+        case "lobby_changes":
+          if (message.version <= lobbiesVersion.current) break;
+          if (message.version !== lobbiesVersion.current + 1) {
+            // Missed an update, resync with a full snapshot
+            current_ws.send(JSON.stringify({ type: "lobby_snapshot" }));
+            break;
+          }
+          lobbiesVersion.current = message.version;
+          setLobbies((prev) =>
+            message.changes.reduce(
+              (
+                list: Lobby[],
+                change: { op: string; lobby?: Lobby; lobby_id?: string }
+              ) => {
+                if (change.op === "removed") {
+                  return list.filter((l) => l.lobby_id !== change.lobby_id);
+                }
+                const lobby = change.lobby as Lobby;
+                return list.some((l) => l.lobby_id === lobby.lobby_id)
+                  ? list.map((l) => (l.lobby_id === lobby.lobby_id ? lobby : l))
+                  : [...list, lobby];
+              },
+              prev
+            )
+          );
+          break;
         case "selection_complete":
           setPhase("guessing");
           break;
@@ -255,6 +284,8 @@ export function GameProvider({ children }: { children: React.ReactNode }) {
   const fetchLobbies = async () => {
     try {
       const result = await api.get("/lobbies");
+      // The REST version comes from whichever worker served it, so only the
+      // socket's lobby_snapshot sets the version deltas are checked against
       setLobbies(result.data.public_lobbies);
     } catch (error) {
       console.error("Failed to fetch lobbies:", error);
@@ -5,6 +5,8 @@ export interface User {
   display_name: string | null;
   avatar_url: string | null;
   banner_url: string | null;
+  avatar_variants: Record<string, string>;
+  banner_variants: Record<string, string>;
   bio: string | null;
   games_played: number;
   games_won: number;
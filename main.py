@@ -1,9 +1,11 @@
 import asyncio
+import bisect
+import copy
+from concurrent.futures import ThreadPoolExecutor
 import hashlib
+import json
+import time
 import uuid
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 from fastapi import (
@@ -14,9 +16,11 @@ from fastapi import (
     WebSocketDisconnect,
     HTTPException,
     Depends,
+    Request,
     status,
 )
-from fastapi.responses import JSONResponse, RedirectResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, RedirectResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import os
@@ -25,18 +29,32 @@ from fastapi import APIRouter
 from fastapi.middleware.cors import CORSMiddleware
 from tortoise.contrib.fastapi import register_tortoise
 from tortoise.exceptions import IntegrityError
+from tortoise.expressions import F
+from tortoise.signals import post_delete, post_save
 import random
 from typing import List, Union, Optional
 import jwt
 from passlib.context import CryptContext
 from pydantic import BaseModel
-from models.game import GameSessionStatus, Uploads, User, GameSession, UserResponse
+from models.game import IMAGE_VARIANTS, variant_urls, GameSessionStatus, Uploads, User, GameSession, UserResponse
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from urllib.parse import quote
 
-from models.storage import StorageConfig, StorageManager, convert_to_webp
+from models.storage import AsyncStorageManager, StorageConfig, StorageManager
+from models.backend import get_lobby_backend
+from models.cache import CachedResponse, ResponseCache, TTLCache
+from models.mail import EmailOutbox, SMTPConfig
+from models.stats import record_game_result, record_games_started
+from models.presence import PresenceBuffer
+from models.ranking import RankIndex
+from models.search import UserSearchIndex
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Set up logging
 logging.basicConfig(
@@ -69,6 +87,7 @@ SMTP_FROM = os.getenv("SMTP_FROM", "")
 SMTP_PASS = os.getenv("SMTP_PASS", "")
 if not SMTP_PASS or SMTP_PORT == 0 or not SMTP_SERVER or not SMTP_USER or not SMTP_FROM:
     raise Exception("Setup SMTP in the .env: SMTP_SERVER, SMTP_PORT, SMTP_USER, SMTP_PASS, SMTP_FROM")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "True").lower() == "true"
 
 JWT_SECRET = os.getenv("JWT_SECRET", "secret")
 JWT_ALGORITHM = "HS256"
@@ -84,30 +103,146 @@ DEBUG_URL=os.getenv("DEBUG_URL")
 if  not ENDPOINT or not ACCESS_KEY or not SECRET_KEY or not BUCKET_NAME or not PUBLIC_URL or not DEBUG_URL:
     raise Exception("Setup S3 in the .env: ENDPOINT, ACCESS_KEY, SECRET_KEY, BUCKET_NAME, PUBLIC_URL")
 
-storage = StorageManager(StorageConfig(ENDPOINT, ACCESS_KEY, SECRET_KEY, BUCKET_NAME, PUBLIC_URL, DEBUG_URL))
+# STORAGE_BACKEND=async talks to S3 with aiobotocore instead of boto3 on threads
+storage = (AsyncStorageManager if os.getenv("STORAGE_BACKEND") == "async" else StorageManager)(
+    StorageConfig(ENDPOINT, ACCESS_KEY, SECRET_KEY, BUCKET_NAME, PUBLIC_URL, DEBUG_URL),
+    convert_workers=int(os.getenv("IMAGE_CONVERT_WORKERS", 2)),
+    convert_queue_limit=int(os.getenv("IMAGE_CONVERT_QUEUE_LIMIT", 16)),
+    max_image_pixels=int(os.getenv("MAX_IMAGE_PIXELS", 40_000_000)),
+    part_size=int(os.getenv("UPLOAD_PART_SIZE", 8 * 1024 * 1024)),
+    max_concurrency=int(os.getenv("STORAGE_CONCURRENCY", 10)),
+)
+email_outbox = EmailOutbox(
+    SMTPConfig(SMTP_SERVER, SMTP_PORT, SMTP_USER, SMTP_PASS, SMTP_FROM, SMTP_STARTTLS),
+    batch_size=int(os.getenv("EMAIL_BATCH_SIZE", 20)),
+    max_attempts=int(os.getenv("EMAIL_MAX_ATTEMPTS", 5)),
+)
+
+# Shared lobby state and broadcast relay between workers (in-process when unset)
+lobby_backend = get_lobby_backend(os.getenv("LOBBY_BACKEND_URL", ""))
 
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
+# Authenticated users and decoded JWT payloads, so get_current_user can skip
+# the signature check and the database on repeat requests
+user_cache: TTLCache[User] = TTLCache(
+    maxsize=int(os.getenv("USER_CACHE_SIZE", 10_000)),
+    ttl=int(os.getenv("USER_CACHE_TTL", 60)),
+)
+token_cache: TTLCache[dict] = TTLCache(
+    maxsize=int(os.getenv("TOKEN_CACHE_SIZE", 10_000)),
+    ttl=int(os.getenv("TOKEN_CACHE_TTL", 300)),
+)
+
+# Public read endpoints; entries are tagged "leaderboard", "lobbies" or "user:<id>"
+response_cache = ResponseCache(
+    maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", 4096)),
+    ttl=int(os.getenv("RESPONSE_CACHE_TTL", 5)),
+)
+
+# Write-behind in_game flags; flushed rows leave the user cache stale
+presence = PresenceBuffer(
+    flush_interval=int(os.getenv("PRESENCE_FLUSH_INTERVAL", 5)),
+    on_flush=lambda user_ids: [user_cache.pop(user_id) for user_id in user_ids],
+)
+
+
+# Order-statistic index answering rank and leaderboard-page queries in memory
+rank_index = RankIndex()
+# n-gram index over usernames and display names for /search/users
+search_index = UserSearchIndex()
+
+
+@post_save(User)
+async def invalidate_cached_user(sender, instance: User, created, using_db, update_fields):
+    user_cache.pop(instance.user_id)
+    response_cache.invalidate(f"user:{instance.user_id}")
+    search_index.add(instance.user_id, instance.username, instance.display_name)
+    if created:
+        response_cache.invalidate("leaderboard")
+        rank_index.update(
+            instance.user_id,
+            {stat: getattr(instance, stat) for stat in RankIndex.STATS},
+        )
+    # Other workers drop their cached copy and re-read the user into their indexes
+    await lobby_backend.publish_users(
+        [instance.user_id],
+        renamed=created or update_fields is None or bool({"username", "display_name"} & set(update_fields)),
+    )
+
+
+@post_delete(User)
+async def drop_cached_user(sender, instance: User, using_db):
+    user_cache.pop(instance.user_id)
+    response_cache.invalidate("leaderboard", f"user:{instance.user_id}")
+    rank_index.remove(instance.user_id)
+    search_index.remove(instance.user_id)
+    await lobby_backend.publish_users([instance.user_id], deleted=True)
+
+
+async def refresh_users(user_ids: list[str], deleted: bool = False) -> None:
+    """Drop cached users and responses and re-read them into the rank index"""
+    for user_id in user_ids:
+        user_cache.pop(user_id)
+    response_cache.invalidate("leaderboard", *(f"user:{user_id}" for user_id in user_ids))
+    if deleted:
+        for user_id in user_ids:
+            rank_index.remove(user_id)
+            search_index.remove(user_id)
+        return
+    if rank_index.ready:
+        await rank_index.refresh(user_ids)
+
+
+async def stats_changed(user_ids: list[str]) -> None:
+    """Refresh users after a stats UPDATE, here and on every other worker"""
+    await refresh_users(user_ids)
+    await lobby_backend.publish_users(user_ids)
+
 
 def utcnow():
     return datetime.now(timezone.utc)
 
-def send_email(to_email: str, subject: str, body: str):
-    msg = MIMEMultipart()
-    msg["From"] = SMTP_FROM
-    msg["To"] = to_email
-    msg["Subject"] = subject
-    msg.attach(MIMEText(body, "html"))
+def dumps(data) -> str:
+    if orjson is not None:
+        return orjson.dumps(data).decode()
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+def cached_response(request: Request, entry: CachedResponse) -> Response:
+    """Serve a cached body, or 304 when the client already has this ETag"""
+    headers = {
+        "ETag": entry.etag,
+        "Cache-Control": f"public, max-age={int(response_cache.ttl)}",
+    }
+    if_none_match = request.headers.get("if-none-match", "")
+    if entry.etag in (tag.strip() for tag in if_none_match.split(",")):
+        response_cache.not_modified += 1
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
+
+
+def cache_response(request: Request, key: tuple, payload, tags: list[str], version: int) -> Response:
+    """Cache a response whose data was read after version was taken from response_cache"""
+    entry = response_cache.set(key, dumps(jsonable_encoder(payload)).encode(), tags, version)
+    return cached_response(request, entry)
 
-    with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-        server.starttls() 
-        server.login(SMTP_USER, SMTP_PASS)
-        server.sendmail(SMTP_USER, to_email, msg.as_string())
 
-async def send_verification(to_email: str, background_tasks: BackgroundTasks, user: User):
+def encode_message(message: dict) -> str:
+    """Serialize a websocket message once so it can be sent to many sockets.
+
+    A GameLobby under the "lobby" key is spliced in from its cached JSON
+    instead of being re-serialized.
+    """
+    lobby = message.get("lobby")
+    if isinstance(lobby, GameLobby):
+        rest = dumps({k: v for k, v in message.items() if k != "lobby"})
+        return f'{rest[:-1]},"lobby":{lobby.to_json()}}}'
+    return dumps(message)
+
+async def send_verification(to_email: str, user: User):
     userToken = uuid.uuid4()
     user.email_token = str(userToken)
     await user.save(update_fields=["email_token"])
@@ -119,7 +254,7 @@ async def send_verification(to_email: str, background_tasks: BackgroundTasks, us
     <p>Please verify your email by clicking below:</p>
     <a href="{verification_link}">Verify Email</a>
     """
-    background_tasks.add_task(send_email, to_email, subject, body)
+    await email_outbox.enqueue(to_email, subject, body)
     return True
 
 
@@ -182,6 +317,7 @@ class LeaderboardEntry(BaseModel):
     username: str
     display_name: str
     avatar_url: Optional[str] = None
+    avatar_variants: dict[str, str] = {}
     games_won: int
     total_score: int
     best_streak: int
@@ -204,6 +340,8 @@ class UserSearchResult(BaseModel):
     display_name: str
     avatar_url: Optional[str] = None
     banner_url: Optional[str] = None
+    avatar_variants: dict[str, str] = {}
+    banner_variants: dict[str, str] = {}
     games_won: int
     total_score: int
     in_game: bool
@@ -228,6 +366,49 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+class PasswordPool:
+    """Runs bcrypt off the event loop on a small dedicated thread pool.
+
+    Once queue_limit jobs are waiting or running, new ones are refused with
+    a 503 instead of piling up behind a login spike.
+    """
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password")
+        self.queue_limit = queue_limit
+        self.in_flight = 0
+        self.rejected = 0
+
+    async def run(self, func, *args):
+        if self.in_flight >= self.queue_limit:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please try again",
+                headers={"Retry-After": "1"},
+            )
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self.in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self.run(hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self.run(verify_password, plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        return {"in_flight": self.in_flight, "rejected": self.rejected}
+
+
+password_pool = PasswordPool(
+    workers=int(os.getenv("PASSWORD_WORKERS", 4)),
+    queue_limit=int(os.getenv("PASSWORD_QUEUE_LIMIT", 64)),
+)
+
+
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
     expire = utcnow() + timedelta(hours=JWT_EXPIRATION_HOURS)
@@ -245,52 +426,124 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    try:
-        payload = jwt.decode(
-            credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM]
-        )
-        user_id: str = payload.get("sub")
-        if user_id is None:
+    token = credentials.credentials
+    payload = token_cache.get(token)
+    if payload is None:
+        try:
+            payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        except jwt.PyJWTError:
             raise credentials_exception
-    except jwt.PyJWTError:
+        # Never keep a token cached past its own expiry
+        remaining = payload.get("exp", 0) - utcnow().timestamp()
+        token_cache.set(token, payload, ttl=min(token_cache.ttl, remaining))
+    user_id: str = payload.get("sub")
+    if user_id is None:
         raise credentials_exception
 
-    user = await User.get_or_none(user_id=user_id)
+    user = user_cache.get(user_id)
     if user is None:
-        raise credentials_exception
-    return user
+        user = await User.get_or_none(user_id=user_id)
+        if user is None:
+            raise credentials_exception
+        user_cache.set(user_id, user)
+    # Handlers may modify their user; unsaved changes must not leak into the cache
+    return copy.copy(user)
 
 
 class ConnectionManager:
     connections: dict[str, "GameWebSocket"] = {}
+    # lobby_id -> user_ids of the connections currently inside that lobby
+    lobby_members: dict[str, set[str]] = {}
+    # user_ids of the connections sitting on the lobby browser (not in a lobby)
+    browsing: set[str] = set()
+    dropped_connections: int = 0
 
     def add(self, user_id: str, ws: "GameWebSocket"):
         self.connections[user_id] = ws
+        if ws.lobby_id:
+            self.lobby_members.setdefault(ws.lobby_id, set()).add(user_id)
+        else:
+            self.browsing.add(user_id)
 
     def remove(self, user_id: str):
-        self.connections.pop(user_id, None)
+        conn = self.connections.pop(user_id, None)
+        if conn and conn.lobby_id:
+            self.leave_lobby(user_id, conn.lobby_id)
+        self.browsing.discard(user_id)
 
     @classmethod
     def get(cls, user_id: str) -> Union["GameWebSocket", None]:
         return cls.connections.get(user_id)
 
+    def join_lobby(self, user_id: str, lobby_id: str):
+        if user_id in self.connections:
+            self.lobby_members.setdefault(lobby_id, set()).add(user_id)
+            self.browsing.discard(user_id)
+
+    def leave_lobby(self, user_id: str, lobby_id: str):
+        if user_id in self.connections:
+            self.browsing.add(user_id)
+        members = self.lobby_members.get(lobby_id)
+        if members is None:
+            return
+        members.discard(user_id)
+        if not members:
+            self.lobby_members.pop(lobby_id, None)
+
+    @classmethod
+    def record_drop(cls, user_id: str, queue_depth: int):
+        cls.dropped_connections += 1
+        logger.warning(
+            f"Dropping slow connection {user_id} (send queue full at {queue_depth})"
+        )
+
+    @classmethod
+    def stats(cls) -> dict:
+        depths = [conn.outbox.qsize() for conn in cls.connections.values()]
+        return {
+            "connections": len(depths),
+            "queued_messages": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "dropped_connections": cls.dropped_connections,
+        }
+
     async def broadcast_lobby(self, message: dict, lobby: str, exclude: List[str] = []):
-        """Send a message to all connections (optionally excluding some)"""
-        for uid, conn in self.connections.items():
-            if uid not in exclude and conn.lobby_id == lobby:
-                try:
-                    await conn.websocket.send_json(message)
-                except Exception:
-                    pass
+        """Queue a message for every connection inside a lobby (optionally excluding some)"""
+        payload = encode_message(message)
+        self.deliver_lobby(payload, lobby, exclude)
+        if lobby_backend.shared:
+            await lobby_backend.relay_lobby(lobby, payload, exclude)
+
+    def deliver_lobby(self, payload: str, lobby: str, exclude: List[str] = []):
+        """Queue an encoded message for the lobby members connected to this worker"""
+        for uid in list(self.lobby_members.get(lobby, ())):
+            conn = self.connections.get(uid)
+            if conn and uid not in exclude:
+                conn.send(payload)
+
+    async def kick(self, user_id: str, message: dict):
+        """Take a user out of their lobby and tell them, wherever they are connected"""
+        conn = self.connections.get(user_id)
+        if conn:
+            conn.set_lobby("")
+            conn.send(message)
+        elif lobby_backend.shared:
+            await lobby_backend.relay_user(user_id, encode_message(message), kick=True)
+
+    async def broadcast_browsers(self, message: dict):
+        """Queue a message for every connection on the lobby browser"""
+        payload = encode_message(message)
+        for uid in list(self.browsing):
+            conn = self.connections.get(uid)
+            if conn:
+                conn.send(payload)
 
     async def broadcast(self, message: dict, exclude: List[str] = []):
-        """Send a message to all connections (optionally excluding some)"""
-        for uid, conn in self.connections.items():
+        """Queue a message for all connections (optionally excluding some)"""
+        payload = encode_message(message)
+        for uid, conn in list(self.connections.items()):
             if uid not in exclude:
-                try:
-                    await conn.websocket.send_json(message)
-                except Exception:
-                    pass
+                conn.send(payload)
 
 
 class Player:
@@ -310,6 +563,16 @@ class Player:
             "is_ready": self.is_ready,
         }
 
+    def to_state(self) -> dict:
+        return {**self.to_dict(), "character": self.character}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "Player":
+        player = cls(state["user_id"], state["username"], state["display_name"])
+        player.is_ready = state["is_ready"]
+        player.character = state["character"]
+        return player
+
 
 class GameLobby:
     def __init__(
@@ -338,8 +601,40 @@ class GameLobby:
         self.is_private = is_private
         self.state: dict = {}  # custom game state (characters, etc.)
         self.created_at = utcnow()
-        self.game_started = False
+        self._game_started = False
         self.user_turn = owner_id
+        # Cached to_dict()/to_json() output, cleared by invalidate()
+        self._snapshot: dict | None = None
+        self._snapshot_json: str | None = None
+        # Monotonic timestamps used by the lobby reaper
+        self.last_activity = time.monotonic()
+        self.finished_at: float | None = None
+        # Bumped on every change so LobbyManager.sync() knows what to share
+        self.revision = 0
+        # The worker that created the lobby and reaps it while it runs
+        self.worker = lobby_backend.worker_id
+
+    @property
+    def game_started(self) -> bool:
+        return self._game_started
+
+    @game_started.setter
+    def game_started(self, value: bool):
+        self._game_started = value
+        self.invalidate()
+
+    def invalidate(self):
+        """Drop the cached snapshot after a change to the public lobby state"""
+        self._snapshot = None
+        self._snapshot_json = None
+        self.revision += 1
+        self.touch()
+
+    def touch(self):
+        self.last_activity = time.monotonic()
+
+    def finish(self):
+        self.finished_at = time.monotonic()
 
     def switch_turn(self):
         if not self.owner or not self.second_player:
@@ -348,6 +643,7 @@ class GameLobby:
             self.user_turn = self.second_player.user_id
         else:
             self.user_turn = self.owner.user_id
+        self.invalidate()
 
     def get_other_player_id(self, user_id: str) -> Optional[Player]:
         if self.owner and self.owner.user_id == user_id:
@@ -366,6 +662,7 @@ class GameLobby:
     def add_second_player(self, user_id: str, username: str, display_name: str):
         if not self.second_player:
             self.second_player = Player(user_id, username, display_name)
+            self.invalidate()
 
     def remove_player(self, user_id: str):
         if self.owner and self.second_player and user_id == self.owner.user_id:
@@ -375,6 +672,7 @@ class GameLobby:
             self.second_player = None
         elif self.owner and user_id == self.owner.user_id:
             self.owner = None
+        self.invalidate()
 
     def is_empty(self) -> bool:
         return self.second_player is None and self.owner is None
@@ -384,6 +682,7 @@ class GameLobby:
             self.owner.is_ready = ready
         elif self.second_player and self.second_player.user_id == user_id:
             self.second_player.is_ready = ready
+        self.invalidate()
 
     def all_players_ready(self) -> bool:
         players = [p for p in [self.owner, self.second_player] if p]
@@ -394,6 +693,7 @@ class GameLobby:
             self.owner.character = character
         elif self.second_player and self.second_player.user_id == user_id:
             self.second_player.character = character
+        self.revision += 1
 
     def all_players_selected(self) -> bool:
         players = [p for p in [self.owner, self.second_player] if p]
@@ -414,6 +714,8 @@ class GameLobby:
 
     async def get_images(self, isRematch: bool = False) -> List[str]:
         self.seed = str(uuid.uuid4()) if isRematch else self.seed
+        self.finished_at = None
+        self.invalidate()
         if isRematch and self.owner and self.owner.character:
             self.owner.character = None
         if isRematch and self.second_player and self.second_player.character:
@@ -432,6 +734,98 @@ class GameLobby:
         return count
 
     def to_dict(self):
+        if self._snapshot is None:
+            self._snapshot = self._build_dict()
+        return self._snapshot
+
+    def to_json(self) -> str:
+        if self._snapshot_json is None:
+            self._snapshot_json = dumps(self.to_dict())
+        return self._snapshot_json
+
+    def to_parts(self) -> dict[str, dict]:
+        """Full lobby state, including secret characters, for sharing between workers.
+
+        Each player is a separate part so workers changing different
+        players at once don't overwrite each other; see RedisLobbyBackend.
+        """
+        parts = {
+            "lobby": {
+                "lobby_id": self.lobby_id,
+                "max_characters": self.max_characters,
+                "seed": self.seed,
+                "password": self.password,
+                "lobby_name": self.lobby_name,
+                "creator_id": self.creator_id,
+                "is_private": self.is_private,
+                "owner": self.owner.user_id if self.owner else None,
+                "second_player": self.second_player.user_id if self.second_player else None,
+                "state": self.state,
+                "created_at": self.created_at.isoformat(),
+                "game_started": self.game_started,
+                "user_turn": self.user_turn,
+                "finished": self.finished_at is not None,
+                "worker": self.worker,
+            }
+        }
+        for player in (self.owner, self.second_player):
+            if player:
+                parts[f"player:{player.user_id}"] = player.to_state()
+        return parts
+
+    @classmethod
+    def from_parts(cls, parts: dict[str, dict | None]) -> "GameLobby":
+        state: dict = parts["lobby"]  # type: ignore
+        lobby = cls(
+            state["lobby_id"],
+            state["max_characters"],
+            state["seed"],
+            state["password"],
+            state["lobby_name"],
+            state["creator_id"],
+            state["is_private"],
+        )
+        lobby.created_at = datetime.fromisoformat(state["created_at"])
+        lobby.worker = state["worker"]
+        lobby.apply_parts(parts, parts)
+        return lobby
+
+    def apply_parts(self, parts: dict[str, dict | None], known: dict[str, dict | None]):
+        """Overwrite the parts of the lobby changed on another worker.
+
+        known holds every part last shared, for players the lobby fields
+        point at whose own part didn't change.
+        """
+        players = {player.user_id: player for player in (self.owner, self.second_player) if player}
+        for part, value in parts.items():
+            if part.startswith("player:"):
+                players[part.removeprefix("player:")] = Player.from_state(value) if value else None
+
+        def player(user_id: str | None) -> Optional[Player]:
+            if user_id is None:
+                return None
+            if user_id not in players and (value := known.get(f"player:{user_id}")):
+                players[user_id] = Player.from_state(value)
+            return players.get(user_id)
+
+        state = parts.get("lobby")
+        if state is None:
+            self.owner = player(self.owner.user_id if self.owner else None)
+            self.second_player = player(self.second_player.user_id if self.second_player else None)
+        else:
+            self.seed = state["seed"]
+            self.owner = player(state["owner"])
+            self.second_player = player(state["second_player"])
+            self.state = state["state"]
+            self._game_started = state["game_started"]
+            self.user_turn = state["user_turn"]
+            if not state["finished"]:
+                self.finished_at = None
+            elif self.finished_at is None:
+                self.finish()
+        self.invalidate()
+
+    def _build_dict(self):
         return {
             "lobby_id": self.lobby_id,
             "lobby_name": self.lobby_name,
@@ -453,6 +847,17 @@ class GameLobby:
 
 class LobbyManager:
     lobbies: dict[str, GameLobby] = {}
+    # Public lobby ids as last announced on the lobby-list feed
+    listed_ids: set[str] = set()
+    feed_version: int = 0
+    # Index of open public lobbies, ordered by creation and by lowercased name
+    open_lobbies: dict[str, GameLobby] = {}
+    open_keys: list[tuple[float, str]] = []
+    name_keys: list[tuple[str, float, str]] = []
+    # lobby_id -> revision last compared with the shared backend
+    published: dict[str, int] = {}
+    # lobby_id -> part -> value last written to or read from the shared backend
+    shared: dict[str, dict[str, dict | None]] = {}
 
     @classmethod
     def create_lobby(
@@ -481,6 +886,7 @@ class LobbyManager:
             owner_display_name,
         )
         cls.lobbies[lobby_id] = lobby
+        cls.reindex(lobby_id)
         return lobby
 
     @classmethod
@@ -492,42 +898,308 @@ class LobbyManager:
         lobby = cls.lobbies.get(lobby_id)
         if lobby and lobby.is_empty():
             cls.lobbies.pop(lobby_id, None)
+            cls.reindex(lobby_id)
+
+    @classmethod
+    def remove(cls, lobby_id: str) -> GameLobby | None:
+        lobby = cls.lobbies.pop(lobby_id, None)
+        cls.reindex(lobby_id)
+        return lobby
+
+    @classmethod
+    async def sync(cls, lobby_id: str):
+        """Push a lobby's changed parts (or its removal) to the shared backend"""
+        if not lobby_backend.shared or not lobby_id:
+            return
+        lobby = cls.lobbies.get(lobby_id)
+        if lobby is None:
+            cls.published.pop(lobby_id, None)
+            if cls.shared.pop(lobby_id, None) is not None:
+                await lobby_backend.delete_lobby(lobby_id)
+            return
+        if cls.published.get(lobby_id) == lobby.revision:
+            return
+        cls.published[lobby_id] = lobby.revision
+        parts: dict[str, dict | None] = lobby.to_parts()  # type: ignore
+        shared = cls.shared.get(lobby_id)
+        if shared is not None:
+            # Players that left are written as None
+            parts.update({part: None for part, value in shared.items() if value and part not in parts})
+            parts = {part: value for part, value in parts.items() if shared.get(part) != value}
+            if not parts:
+                return
+        cls.shared[lobby_id] = {**(shared or {}), **parts}
+        await lobby_backend.save_lobby(lobby_id, parts, create=shared is None)
+
+    @classmethod
+    def apply_remote(cls, lobby_id: str, parts: dict[str, dict | None] | None):
+        """Mirror the parts of a lobby created, changed or removed on another worker"""
+        if parts is None:
+            cls.lobbies.pop(lobby_id, None)
+            cls.published.pop(lobby_id, None)
+            cls.shared.pop(lobby_id, None)
+        elif parts:
+            shared = cls.shared.setdefault(lobby_id, {})
+            shared.update(parts)
+            lobby = cls.lobbies.get(lobby_id)
+            if lobby is None:
+                if not shared.get("lobby"):
+                    return
+                lobby = cls.lobbies[lobby_id] = GameLobby.from_parts(shared)
+            else:
+                lobby.apply_parts(parts, shared)
+        cls.reindex(lobby_id)
+
+    @classmethod
+    async def stale_lobbies(
+        cls, idle_ttl: float, finished_ttl: float, abandoned_ttl: float
+    ) -> list[GameLobby]:
+        """Lobbies that sat idle, finished or without any connected player for too long.
+
+        A lobby is judged by the worker that created it, or by any worker
+        once that one is gone. It is abandoned when none of its players
+        holds a session lease, wherever they are connected.
+        """
+        lobbies = list(cls.lobbies.values())
+        live_workers = await lobby_backend.live_workers(list({lobby.worker for lobby in lobbies}))
+        now = time.monotonic()
+        stale, quiet = [], []
+        for lobby in lobbies:
+            if lobby.worker != lobby_backend.worker_id and lobby.worker in live_workers:
+                continue
+            idle = now - lobby.last_activity
+            if idle > idle_ttl or (
+                lobby.finished_at is not None and now - lobby.finished_at > finished_ttl
+            ):
+                stale.append(lobby)
+            elif idle > abandoned_ttl:
+                quiet.append(lobby)
+        players = {
+            lobby.lobby_id: [p.user_id for p in (lobby.owner, lobby.second_player) if p]
+            for lobby in quiet
+        }
+        connected = await lobby_backend.live_presence(
+            [user_id for user_ids in players.values() for user_id in user_ids]
+        )
+        stale += [lobby for lobby in quiet if connected.isdisjoint(players[lobby.lobby_id])]
+        return stale
+
+    @classmethod
+    def is_listed(cls, lobby: GameLobby | None) -> bool:
+        return lobby is not None and not lobby.is_private and not lobby.game_started
+
+    @classmethod
+    def reindex(cls, lobby_id: str):
+        """Add or drop a lobby from the open public lobby index"""
+        lobby = cls.lobbies.get(lobby_id)
+        if cls.is_listed(lobby):
+            if lobby_id in cls.open_lobbies:
+                return
+            cls.open_lobbies[lobby_id] = lobby  # type: ignore
+            key = (lobby.created_at.timestamp(), lobby_id)  # type: ignore
+            bisect.insort(cls.open_keys, key)
+            bisect.insort(cls.name_keys, (lobby.lobby_name.lower(), *key))  # type: ignore
+            return
+        lobby = cls.open_lobbies.pop(lobby_id, None)
+        if lobby is None:
+            return
+        key = (lobby.created_at.timestamp(), lobby_id)
+        for keys, entry in (
+            (cls.open_keys, key),
+            (cls.name_keys, (lobby.lobby_name.lower(), *key)),
+        ):
+            index = bisect.bisect_left(keys, entry)  # type: ignore
+            if index < len(keys) and keys[index] == entry:
+                del keys[index]
 
     @classmethod
     def get_public_lobbies(cls):
-        return [
-            lobby.to_dict()
-            for _, lobby in cls.lobbies.items()
-            if not lobby.is_private and not lobby.game_started
-        ]
+        return [lobby.to_dict() for lobby in cls.open_lobbies.values()]
+
+    @classmethod
+    def page_public_lobbies(
+        cls, cursor: str | None = None, limit: int = 20, name: str = ""
+    ) -> tuple[list[dict], str | None]:
+        """Page through open public lobbies oldest first.
+
+        With a name prefix, matches are ordered by name and then age, so a
+        page is a bisect and a slice of the name index whatever its size.
+        Raises ValueError for a malformed cursor.
+        """
+        after = None
+        if cursor:
+            created, _, rest = cursor.partition(":")
+            lobby_id, _, cursor_name = rest.partition(":")
+            after = (float(created), lobby_id)
+        if name:
+            prefix = name.lower()
+            lo = bisect.bisect_left(cls.name_keys, (prefix,))
+            hi = bisect.bisect_left(cls.name_keys, (prefix + "\uffff",))
+            if after:
+                lo = max(lo, bisect.bisect_right(cls.name_keys, (cursor_name, *after)))
+            page = cls.name_keys[lo : min(hi, lo + limit + 1)]
+        else:
+            start = bisect.bisect_right(cls.open_keys, after) if after else 0
+            page = [("", *key) for key in cls.open_keys[start : start + limit + 1]]
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            name_key, created, lobby_id = page[-1]
+            next_cursor = f"{created!r}:{lobby_id}" + (f":{name_key}" if name else "")
+        return [cls.open_lobbies[lobby_id].to_dict() for _, _, lobby_id in page], next_cursor
+
+    @classmethod
+    def snapshot(cls) -> dict:
+        return {
+            "version": cls.feed_version,
+            "public_lobbies": cls.get_public_lobbies(),
+            "total_lobbies": len(cls.lobbies),
+        }
+
+    @classmethod
+    def lobby_change(cls, lobby_id: str) -> dict | None:
+        """Work out how a lobby's entry on the public lobby list changed.
+
+        Returns None when the public list is unaffected, otherwise an
+        added/updated/removed change, and records it as announced.
+        """
+        lobby = cls.lobbies.get(lobby_id)
+        if cls.is_listed(lobby):
+            change = {
+                "op": "updated" if lobby_id in cls.listed_ids else "added",
+                "lobby": lobby.to_dict(),  # type: ignore
+            }
+            cls.listed_ids.add(lobby_id)
+            return change
+        if lobby_id in cls.listed_ids:
+            cls.listed_ids.discard(lobby_id)
+            return {"op": "removed", "lobby_id": lobby_id}
+        return None
 
     @classmethod
     def get_all_lobbies(cls):
         return [lobby.to_dict() for _, lobby in cls.lobbies.items()]
 
 
+class LobbyListPublisher:
+    """Batches lobby-list changes and pushes at most one update per window.
+
+    Changes to the same lobby inside a window collapse into one entry, and
+    only sockets on the lobby browser receive the update.
+    """
+
+    WINDOW_SECONDS = int(os.getenv("LOBBY_FEED_WINDOW_MS", 150)) / 1000
+
+    def __init__(self, connection: ConnectionManager):
+        self.connection = connection
+        self.pending: set[str] = set()
+        self.flush_task: asyncio.Task | None = None
+        self.changes_marked = 0
+        self.broadcasts_sent = 0
+
+    def mark(self, lobby_id: str):
+        """Record that a lobby may have changed on the public list"""
+        self.pending.add(lobby_id)
+        self.changes_marked += 1
+        response_cache.invalidate("lobbies")
+        if self.flush_task is None:
+            self.flush_task = asyncio.create_task(self.flush_later())
+
+    async def flush_later(self):
+        await asyncio.sleep(self.WINDOW_SECONDS)
+        self.flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        lobby_ids, self.pending = self.pending, set()
+        changes = [
+            change
+            for change in map(LobbyManager.lobby_change, lobby_ids)
+            if change is not None
+        ]
+        if not changes:
+            return
+        LobbyManager.feed_version += 1
+        self.broadcasts_sent += 1
+        await self.connection.broadcast_browsers(
+            {
+                "type": "lobby_changes",
+                "version": LobbyManager.feed_version,
+                "changes": changes,
+                "total_lobbies": len(LobbyManager.lobbies),
+            }
+        )
+
+    def stats(self) -> dict:
+        return {
+            "changes": self.changes_marked,
+            "broadcasts": self.broadcasts_sent,
+            "broadcasts_saved": self.changes_marked - self.broadcasts_sent,
+        }
+
+
 class GameWebSocket:
     HEARTBEAT_INTERVAL = 7
+    SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", 64))
     connection = ConnectionManager()
+    lobby_feed = LobbyListPublisher(connection)
 
     def __init__(self, websocket: WebSocket, user: User):
         self.websocket = websocket
         self.user = user
         self.heartbeat_task: asyncio.Task | None = None
         self.message_task: asyncio.Task | None = None
+        self.writer_task: asyncio.Task | None = None
+        # Set once the send queue overflowed and the socket is being dropped
+        self.dropped = False
+        self.outbox: asyncio.Queue[str] = asyncio.Queue(maxsize=self.SEND_QUEUE_SIZE)
         self.lobby_id: str = ""
         self.signed_in = False
         self.game_session: Optional[GameSession] = None
+        # Lease token proving this is the user's only live session across workers
+        self.presence_token = uuid.uuid4().hex
+
+    def set_lobby(self, lobby_id: str):
+        """Move this connection into (or out of, with "") a lobby, keeping the member index in sync"""
+        was_in_lobby = bool(self.lobby_id)
+        if was_in_lobby:
+            self.connection.leave_lobby(self.user.user_id, self.lobby_id)
+        self.lobby_id = lobby_id
+        if lobby_id:
+            self.connection.join_lobby(self.user.user_id, lobby_id)
+        elif was_in_lobby:
+            # Lobby-list updates weren't delivered while in the lobby
+            self.send({"type": "lobby_snapshot", **LobbyManager.snapshot()})
+
+    @classmethod
+    def presence_ttl(cls) -> float:
+        # A lease survives a couple of missed heartbeats but not a crashed worker
+        return cls.HEARTBEAT_INTERVAL * 3
 
     async def start(self):
         """Entry point to manage WebSocket lifecycle"""
+        if not await lobby_backend.claim_presence(
+            self.user.user_id, self.presence_token, self.presence_ttl()
+        ):
+            await self.websocket.accept()
+            await self.websocket.send_json(
+                {
+                    "type": "connected_error",
+                    "message": "User already connected in another session.",
+                }
+            )
+            await self.websocket.close(
+                code=status.WS_1008_POLICY_VIOLATION, reason="User already connected"
+            )
+            return
         await self.websocket.accept()
+        self.writer_task = asyncio.create_task(self.send_messages())
         self.heartbeat_task = asyncio.create_task(self.send_heartbeat())
         self.message_task = asyncio.create_task(self.handle_messages())
 
         try:
             done, pending = await asyncio.wait(
-                [self.heartbeat_task, self.message_task],
+                [self.writer_task, self.heartbeat_task, self.message_task],
                 return_when=asyncio.FIRST_COMPLETED,
             )
 
@@ -542,12 +1214,48 @@ class GameWebSocket:
         finally:
             await self.cleanup()
 
-    async def send_heartbeat(self):
+    def send(self, message: dict | str) -> bool:
+        """Queue a message (or an already encoded payload) for this socket without waiting on the network.
+
+        A client that lets its queue fill up is dropped so it can't hold back
+        the senders; the writer task is cancelled, which ends the session.
+        """
+        if isinstance(message, dict):
+            message = encode_message(message)
+        try:
+            self.outbox.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            if not self.dropped:
+                self.dropped = True
+                self.connection.record_drop(self.user.user_id, self.outbox.qsize())
+            if self.writer_task and not self.writer_task.done():
+                self.writer_task.cancel()
+            return False
+
+    async def send_messages(self):
+        """Drain the outbound queue onto the socket"""
         while True:
+            payload = await self.outbox.get()
             try:
-                await self.websocket.send_json({"type": "ping"})
+                await self.websocket.send_text(payload)
             except Exception:
                 break
+
+    async def send_heartbeat(self):
+        while True:
+            if not self.send({"type": "ping"}):
+                break
+            try:
+                renewed = await lobby_backend.renew_presence(
+                    self.user.user_id, self.presence_token, self.presence_ttl()
+                )
+            except Exception as e:
+                logger.warning(f"Presence renewal failed: {e}")
+                renewed = True
+            if not renewed:
+                logger.warning(f"Session lease lost for {self.user.username}")
+                break
             await asyncio.sleep(self.HEARTBEAT_INTERVAL)
 
     async def handle_messages(self):
@@ -556,12 +1264,21 @@ class GameWebSocket:
             while True:
                 data: dict = await self.websocket.receive_json()
                 msg_type = data.get("type", "")
+                previous_lobby_id = self.lobby_id
+                if msg_type != "pong" and self.lobby_id:
+                    lobby = LobbyManager.get(self.lobby_id)
+                    if lobby:
+                        lobby.touch()
 
                 if msg_type == "pong":
                     continue
+                elif msg_type == "lobby_snapshot":
+                    self.send({"type": "lobby_snapshot", **LobbyManager.snapshot()})
                 elif msg_type == "sign":
                     self.connection.add(self.user.user_id, self)
                     self.signed_in = True
+                    # Feed versions are per worker; the socket's own snapshot sets the baseline
+                    self.send({"type": "lobby_snapshot", **LobbyManager.snapshot()})
                 elif msg_type == "create_lobby":
                     if not self.signed_in:
                         self.connection.add(self.user.user_id, self)
@@ -576,19 +1293,13 @@ class GameWebSocket:
                         self.user.username,
                         self.user.display_name,
                     )
-                    self.lobby_id = lobby.lobby_id
-                    await self.websocket.send_json(
-                        {"type": "lobby_created", "lobby": lobby.to_dict()}
-                    )
-                    await self.connection.broadcast(
-                        {
-                            "type": "new_lobby",
-                            "public_lobbies": LobbyManager.get_public_lobbies(),
-                            "total_lobbies": len(LobbyManager.lobbies),
-                        }
+                    self.set_lobby(lobby.lobby_id)
+                    self.send(
+                        {"type": "lobby_created", "lobby": lobby}
                     )
+                    self.lobby_feed.mark(lobby.lobby_id)
                     self.user.in_game = True
-                    await self.user.save(update_fields=["in_game"])
+                    presence.set(self.user.user_id, True)
 
                 elif msg_type == "join_lobby":
                     lobby_id: str = data.get("lobby_id", "")
@@ -596,19 +1307,19 @@ class GameWebSocket:
                     lobby = LobbyManager.get(lobby_id)
 
                     if not lobby:
-                        await self.websocket.send_json(
+                        self.send(
                             {"type": "join_failed", "reason": "Lobby not found"}
                         )
                         continue
 
                     if lobby.password and lobby.password != password:
-                        await self.websocket.send_json(
+                        self.send(
                             {"type": "join_failed", "reason": "Incorrect password"}
                         )
                         continue
 
                     if lobby.game_started:
-                        await self.websocket.send_json(
+                        self.send(
                             {"type": "join_failed", "reason": "Game already started"}
                         )
                         continue
@@ -617,7 +1328,7 @@ class GameWebSocket:
                     lobby.add_second_player(
                         self.user.user_id, self.user.username, self.user.display_name
                     )
-                    self.lobby_id = lobby_id
+                    self.set_lobby(lobby_id)
 
                     await self.connection.broadcast_lobby(
                         {
@@ -627,16 +1338,17 @@ class GameWebSocket:
                                 "username": self.user.username,
                                 "display_name": self.user.display_name,
                             },
-                            "lobby": lobby.to_dict(),
+                            "lobby": lobby,
                         },
                         self.lobby_id,
                     )
 
-                    await self.websocket.send_json(
-                        {"type": "lobby_joined", "lobby": lobby.to_dict()}
+                    self.send(
+                        {"type": "lobby_joined", "lobby": lobby}
                     )
+                    self.lobby_feed.mark(lobby_id)
                     self.user.in_game = True
-                    await self.user.save(update_fields=["in_game"])
+                    presence.set(self.user.user_id, True)
 
                 elif msg_type == "ready":
                     lobby = LobbyManager.get(self.lobby_id)
@@ -646,7 +1358,7 @@ class GameWebSocket:
                         await self.connection.broadcast_lobby(
                             {
                                 "type": "player_ready_changed",
-                                "lobby": lobby.to_dict(),
+                                "lobby": lobby,
                                 "user_id": self.user.user_id,
                                 "ready": is_ready,
                                 "all_ready": lobby.all_players_ready(),
@@ -658,13 +1370,13 @@ class GameWebSocket:
                     lobby = LobbyManager.get(self.lobby_id)
                     isRematch = data.get("isRematch", False)
                     if not lobby:
-                        await self.websocket.send_json(
+                        self.send(
                             {"type": "start_failed", "reason": "Lobby not found"}
                         )
                         continue
 
                     if lobby.creator_id != self.user.user_id:
-                        await self.websocket.send_json(
+                        self.send(
                             {
                                 "type": "start_failed",
                                 "reason": "Only lobby creator can start the game",
@@ -673,7 +1385,7 @@ class GameWebSocket:
                         continue
 
                     if not lobby.all_players_ready():
-                        await self.websocket.send_json(
+                        self.send(
                             {
                                 "type": "start_failed",
                                 "reason": "Not all players are ready",
@@ -684,6 +1396,8 @@ class GameWebSocket:
                     images = await lobby.get_images(isRematch)
                     lobby.state["images"] = images
                     lobby.game_started = True
+                    LobbyManager.reindex(lobby.lobby_id)
+                    self.lobby_feed.mark(lobby.lobby_id)
 
                     # Create game session in database
                     self.game_session = await GameSession.create(
@@ -696,15 +1410,11 @@ class GameWebSocket:
                             "seed": lobby.seed,
                         },
                     )
-                    for p in [lobby.owner, lobby.second_player]:
-                        if not p:
-                            continue
-                        user = await User.get_or_none(user_id=p.user_id)
-                        logger.info(user)
-                        if not user:
-                            continue
-                        user.games_played += 1
-                        await user.save(update_fields=["games_played"])
+                    player_ids = [
+                        p.user_id for p in [lobby.owner, lobby.second_player] if p
+                    ]
+                    await record_games_started(player_ids)
+                    await stats_changed(player_ids)
 
                     await self.connection.broadcast_lobby(
                         {
@@ -719,13 +1429,13 @@ class GameWebSocket:
                     character = data.get("character")
                     lobby = LobbyManager.get(self.lobby_id)
                     if lobby and character:
+                        selected = lobby.all_players_selected()
                         lobby.set_player_character(self.user.user_id, character)
-                        if lobby.all_players_selected():
-                            await self.connection.broadcast_lobby(
-                                {
-                                    "type": "selection_complete",
-                                    "lobby": lobby.to_dict(),
-                                },
+                        if not selected and lobby.all_players_selected():
+                            # Only members here: other workers announce it when they
+                            # apply this pick, even if both picks raced
+                            self.connection.deliver_lobby(
+                                encode_message({"type": "selection_complete", "lobby": lobby}),
                                 self.lobby_id,
                             )
                 elif msg_type == "guess":
@@ -741,49 +1451,34 @@ class GameWebSocket:
                                 continue
                                 
                             
-                            await self.websocket.send_json(
+                            self.send(
                                 {
                                     "type": "correct_guess",
                                     "character": guessed_character,
-                                    "lobby": lobby.to_dict(),
+                                    "lobby": lobby,
                                 }
                             )
                             await self.connection.broadcast_lobby(
                                 {
                                     "type": "player_scored",
                                     "character": user.character,
-                                    "lobby": lobby.to_dict(),
+                                    "lobby": lobby,
                                 },
                                 self.lobby_id,
                                 [self.user.user_id],
                             )
                             # Update user stats
-                            self.user.games_won += 1
-                            self.user.total_score += 1
-                            self.user.current_streak += 1
-                            if self.user.current_streak > self.user.best_streak:
-                                self.user.best_streak = self.user.current_streak
-                            await self.user.save(
-                                update_fields=[
-                                    "games_won",
-                                    "total_score",
-                                    "current_streak",
-                                    "best_streak",
-                                ]
-                            )
                             other_player = lobby.get_other_player_id(
                                 self.user.user_id
                             )
-                            if other_player:
-                                other_user = await User.get_or_none(
-                                    user_id=other_player.user_id
-                                )
-                                if other_user:
-                                    other_user.current_streak = 0
-                                    other_user.games_lose += 1
-                                    await other_user.save(update_fields=["current_streak", "games_lose"])
+                            loser_id = other_player.user_id if other_player else None
+                            await record_game_result(self.user.user_id, loser_id)
+                            await stats_changed(
+                                [uid for uid in (self.user.user_id, loser_id) if uid]
+                            )
 
                             # End game session
+                            lobby.finish()
                             if self.game_session:
                                 self.game_session.ended_at = utcnow()
                                 self.game_session.winner_id = self.user.user_id
@@ -792,17 +1487,17 @@ class GameWebSocket:
                                 self.game_session = None
                         else:
                             lobby.switch_turn()
-                            await self.websocket.send_json(
+                            self.send(
                                 {
                                     "type": "incorrect_guess",
                                     "character": guessed_character,
-                                    "lobby": lobby.to_dict(),
+                                    "lobby": lobby,
                                 }
                             )
                             await self.connection.broadcast_lobby(
                                 {
                                     "type": "update_lobby",
-                                    "lobby": lobby.to_dict(),
+                                    "lobby": lobby,
                                 },
                                 self.lobby_id,
                             )
@@ -813,7 +1508,7 @@ class GameWebSocket:
                         await self.connection.broadcast_lobby(
                             {
                                 "type": "end_turn",
-                                "lobby": lobby.to_dict(),
+                                "lobby": lobby,
                             },
                             self.lobby_id,
                         )
@@ -822,7 +1517,7 @@ class GameWebSocket:
                     if not lobby:
                         continue
                     if lobby.creator_id != self.user.user_id:
-                        await self.websocket.send_json(
+                        self.send(
                             {
                                 "type": "kick_failed",
                                 "reason": "Only lobby creator can kick players",
@@ -837,26 +1532,22 @@ class GameWebSocket:
                         and lobby.second_player.user_id == kick_user_id
                     ):
                         lobby.remove_player(kick_user_id)
+                        self.lobby_feed.mark(self.lobby_id)
                         await self.connection.broadcast_lobby(
                             {
                                 "type": "player_kicked",
-                                "lobby": lobby.to_dict(),
+                                "lobby": lobby,
                             },
                             self.lobby_id,
                         )
-                        kicked_conn = self.connection.get(kick_user_id)
-                        if kicked_conn:
-                            kicked_conn.lobby_id = ""
-                            await kicked_conn.websocket.send_json(
-                                {
-                                    "type": "kicked",
-                                    "reason": "You were kicked from the lobby",
-                                }
-                            )
-                        user = await User.get_or_none(user_id=kick_user_id)
-                        if user:
-                            user.in_game = False
-                            await user.save(update_fields=["in_game"])
+                        await self.connection.kick(
+                            kick_user_id,
+                            {
+                                "type": "kicked",
+                                "reason": "You were kicked from the lobby",
+                            },
+                        )
+                        presence.set(kick_user_id, False)
                 elif msg_type == "chat_message":
                     message = data.get("message", "").strip()
                     if message and len(message) <= 500:  # Limit message length
@@ -883,27 +1574,25 @@ class GameWebSocket:
                                 "type": f"player_left{"_in_game" if in_game else ""}",
                                 "user_id": self.user.user_id,
                                 "username": self.user.username,
-                                "lobby": lobby.to_dict(),
+                                "lobby": lobby,
                             },
                             self.lobby_id,
                             [self.user.user_id],
                         )
 
                         LobbyManager.delete_if_empty(self.lobby_id)
-                        await self.connection.broadcast(
-                            {
-                                "type": "new_lobby",
-                                "public_lobbies": LobbyManager.get_public_lobbies(),
-                                "total_lobbies": len(LobbyManager.lobbies),
-                            }
-                        )
-                        self.lobby_id = ""
+                        self.lobby_feed.mark(self.lobby_id)
+                        self.set_lobby("")
                         self.user.in_game = False
-                        await self.user.save(update_fields=["in_game"])
+                        presence.set(self.user.user_id, False)
 
                 else:
                     logger.warning(f"Unknown message type: {msg_type}")
 
+                await LobbyManager.sync(previous_lobby_id)
+                if self.lobby_id != previous_lobby_id:
+                    await LobbyManager.sync(self.lobby_id)
+
         except WebSocketDisconnect:
             logger.info(f"User {self.user.username} disconnected")
         except Exception as e:
@@ -911,7 +1600,7 @@ class GameWebSocket:
 
     async def cleanup(self):
         """Cancel tasks and close WebSocket"""
-        for task in [self.heartbeat_task, self.message_task]:
+        for task in [self.writer_task, self.heartbeat_task, self.message_task]:
             if task and not task.done():
                 task.cancel()
                 try:
@@ -924,37 +1613,198 @@ class GameWebSocket:
             if lobby:
                 in_game = lobby.game_started
                 self.user.in_game = False
-                await self.user.save(update_fields=["in_game"])
+                presence.set(self.user.user_id, False)
                 lobby.remove_player(self.user.user_id)
                 await self.connection.broadcast_lobby(
                     {
                         "type": f"player_left{"_in_game" if in_game else ""}",
                         "user_id": self.user.user_id,
                         "username": self.user.username,
-                        "lobby": lobby.to_dict(),
+                        "lobby": lobby,
                     },
                     self.lobby_id,
                     [self.user.user_id],
                 )
 
                 LobbyManager.delete_if_empty(self.lobby_id)
-                await self.connection.broadcast(
-                    {
-                        "type": "new_lobby",
-                        "public_lobbies": LobbyManager.get_public_lobbies(),
-                        "total_lobbies": len(LobbyManager.lobbies),
-                    }
-                )
+                self.lobby_feed.mark(self.lobby_id)
+                await LobbyManager.sync(self.lobby_id)
 
             self.connection.remove(self.user.user_id)
+            await lobby_backend.release_presence(self.user.user_id, self.presence_token)
             await self.websocket.close()
         except Exception as e:
             logger.warning(f"Cleanup error: {e}")
 
 
+def apply_presence(user: User) -> User:
+    """Set in_game from live lobby state, or the unflushed value, over the stored flag"""
+    conn = ConnectionManager.get(user.user_id)
+    if conn:
+        user.in_game = bool(conn.lobby_id)
+    else:
+        user.in_game = presence.get(user.user_id, user.in_game)
+    return user
+
+
+class LobbyReaper:
+    """Periodically closes lobbies that were abandoned or left idle.
+
+    Covers lobbies whose sockets died without a clean cleanup() and
+    finished games nobody left; their sessions are cancelled and the
+    players' in_game flags cleared through the presence buffer.
+    """
+
+    INTERVAL = int(os.getenv("LOBBY_REAP_INTERVAL", 60))
+    IDLE_TTL = int(os.getenv("LOBBY_IDLE_TTL", 30 * 60))
+    FINISHED_TTL = int(os.getenv("LOBBY_FINISHED_TTL", 10 * 60))
+    ABANDONED_TTL = int(os.getenv("LOBBY_ABANDONED_TTL", 2 * 60))
+
+    def __init__(self):
+        self.task: asyncio.Task | None = None
+        self.reaped_lobbies = 0
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.INTERVAL)
+            try:
+                await self.reap()
+            except Exception as e:
+                logger.warning(f"Lobby reaper error: {e}")
+
+    async def reap(self) -> int:
+        stale = await LobbyManager.stale_lobbies(
+            self.IDLE_TTL, self.FINISHED_TTL, self.ABANDONED_TTL
+        )
+        if not stale:
+            return 0
+
+        lobby_ids = [lobby.lobby_id for lobby in stale]
+        user_ids = []
+        for lobby in stale:
+            LobbyManager.remove(lobby.lobby_id)
+            GameWebSocket.lobby_feed.mark(lobby.lobby_id)
+            await LobbyManager.sync(lobby.lobby_id)
+            for player in [lobby.owner, lobby.second_player]:
+                if not player:
+                    continue
+                user_ids.append(player.user_id)
+                conn = ConnectionManager.get(player.user_id)
+                if conn and conn.lobby_id == lobby.lobby_id:
+                    conn.send({"type": "lobby_closed", "reason": "Lobby expired"})
+                    conn.set_lobby("")
+                    conn.game_session = None
+                    conn.user.in_game = False
+
+        await GameSession.filter(
+            lobby_id__in=lobby_ids,
+            status__in=[GameSessionStatus.WAITING, GameSessionStatus.IN_PROGRESS],
+        ).update(status=GameSessionStatus.CANCELLED, ended_at=utcnow())
+        # Cleared in bulk by the next presence flush
+        for user_id in user_ids:
+            presence.set(user_id, False)
+
+        self.reaped_lobbies += len(stale)
+        logger.info(f"Reaped {len(stale)} stale lobbies")
+        return len(stale)
+
+    def stats(self) -> dict:
+        return {"reaped_lobbies": self.reaped_lobbies, "open_lobbies": len(LobbyManager.lobbies)}
+
+
+lobby_reaper = LobbyReaper()
+
+
+async def handle_backend_event(event: dict):
+    """Apply a lobby change or deliver a relayed message from another worker"""
+    kind = event.get("kind")
+    if kind == "lobby":
+        lobby_id = event["lobby_id"]
+        lobby = LobbyManager.get(lobby_id)
+        selected = lobby is not None and lobby.all_players_selected()
+        LobbyManager.apply_remote(lobby_id, event["parts"])
+        GameWebSocket.lobby_feed.mark(lobby_id)
+        lobby = LobbyManager.get(lobby_id)
+        if lobby is None:
+            return
+        connection = ConnectionManager()
+        if event["stale"]:
+            # The sender's broadcast missed a change made here at the same time
+            connection.deliver_lobby(encode_message({"type": "update_lobby", "lobby": lobby}), lobby_id)
+        if not selected and lobby.all_players_selected():
+            # Every worker tells its own members once its copy has both picks
+            connection.deliver_lobby(
+                encode_message({"type": "selection_complete", "lobby": lobby}), lobby_id
+            )
+    elif kind == "lobby_deleted":
+        LobbyManager.apply_remote(event["lobby_id"], None)
+        GameWebSocket.lobby_feed.mark(event["lobby_id"])
+        # Members connected here are in a lobby that no longer exists
+        for user_id in list(ConnectionManager.lobby_members.get(event["lobby_id"], ())):
+            conn = ConnectionManager.get(user_id)
+            if conn and conn.lobby_id == event["lobby_id"]:
+                conn.send({"type": "lobby_closed", "reason": "Lobby closed"})
+                conn.set_lobby("")
+                conn.game_session = None
+                conn.user.in_game = False
+            presence.set(user_id, False)
+    elif kind == "relay":
+        # Traffic on another worker keeps the lobby alive for its reaper here
+        lobby = LobbyManager.get(event["lobby_id"])
+        if lobby:
+            lobby.touch()
+        ConnectionManager().deliver_lobby(event["payload"], event["lobby_id"], event["exclude"])
+    elif kind == "users":
+        await refresh_users(event["user_ids"], event["deleted"])
+        # Local writes update the search index through the User signals
+        if event["renamed"] and search_index.ready:
+            await search_index.refresh(event["user_ids"])
+    elif kind == "user":
+        conn = ConnectionManager.get(event["user_id"])
+        if conn:
+            if event.get("kick"):
+                conn.set_lobby("")
+            conn.send(event["payload"])
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+    for lobby_id, parts in (await lobby_backend.start(handle_backend_event)).items():
+        LobbyManager.apply_remote(lobby_id, {part: value for part, (_, value) in parts.items()})
+    await rank_index.build()
+    await search_index.build()
+    await storage.start()
+    lobby_reaper.start()
+    email_outbox.start()
+    presence.start()
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    await lobby_reaper.stop()
+    await lobby_backend.stop()
+    await email_outbox.stop()
+    await presence.stop()
+    await storage.stop()
+    password_pool.executor.shutdown(wait=False)
+
+
 # Authentication endpoints
 @api.post("/auth/register", response_model=TokenResponse)
-async def register_user(user_data: UserRegister, background_tasks: BackgroundTasks):
+async def register_user(user_data: UserRegister):
     try:
         if "@" in user_data.username:
             raise HTTPException(
@@ -976,7 +1826,7 @@ async def register_user(user_data: UserRegister, background_tasks: BackgroundTas
             )
 
         # Create new user
-        hashed_password = hash_password(user_data.password)
+        hashed_password = await password_pool.hash(user_data.password)
         user = await User.create(
             user_id=str(uuid.uuid4()),
             username=user_data.username.lower(),
@@ -985,7 +1835,7 @@ async def register_user(user_data: UserRegister, background_tasks: BackgroundTas
             display_name=user_data.display_name or user_data.username.capitalize(),
         )
         if not DEBUG:
-            await send_verification(user.email, background_tasks, user)
+            await send_verification(user.email, user)
 
         # Create access token
         access_token = create_access_token(data={"sub": user.user_id})
@@ -1008,7 +1858,7 @@ async def login_user(user_data: UserLogin, background_tasks: BackgroundTasks):
         user = await User.get_or_none(email=user_data.username.lower())
     else:
         user = await User.get_or_none(username=user_data.username.lower())
-    if not user or not verify_password(user_data.password, user.password_hash):
+    if not user or not await password_pool.verify(user_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -1023,14 +1873,14 @@ async def login_user(user_data: UserLogin, background_tasks: BackgroundTasks):
     return TokenResponse(
         access_token=access_token,
         token_type="bearer",
-        user=user.export_data(),
+        user=apply_presence(user).export_data(),
     )
 
 @api.post("/auth/send_verification")
-async def auth_send_verification(background_tasks: BackgroundTasks, user: User = Depends(get_current_user)):
+async def auth_send_verification(user: User = Depends(get_current_user)):
     if user.is_verified:
         return {"status": "already verified"}
-    await send_verification(user.email, background_tasks, user)
+    await send_verification(user.email, user)
     return {"status": "sent"}
 
 @api.get("/auth/verify")
@@ -1051,21 +1901,28 @@ async def verify(email: str, token: str):
 
 @api.get("/auth/me", response_model=UserResponse)
 async def get_current_user_info(current_user: User = Depends(get_current_user)):
-    data = current_user.export_data()
+    data = apply_presence(current_user).export_data()
     if current_user.is_verified and current_user.toast_user:
         current_user.toast_user = False
         await current_user.save(update_fields=["toast_user"])
     return data
 
 @api.get("/user/{username}", response_model=UserResponse)
-async def get_user(username: str):
+async def get_user(request: Request, username: str):
+    key = ("user", username)
+    if entry := response_cache.get(key):
+        return cached_response(request, entry)
+    version = response_cache.version
     user = await User.get_or_none(username=username)
     if not user:
         raise HTTPException(404, "User Not Found")
-    return user.export_data(False)
+    return cache_response(
+        request, key, apply_presence(user).export_data(False), [f"user:{user.user_id}"], version
+    )
 
 @api.get("/leaderboard", response_model=LeaderboardResponse)
 async def get_leaderboard(
+    request: Request,
     sort_by: str = "games_won",
     order: str = "desc",
     page: int = 1,
@@ -1100,26 +1957,39 @@ async def get_leaderboard(
     if order.lower() not in ["asc", "desc"]:
         order = "desc"
     
-    # Build query
-    query = User.all()
+    key = ("leaderboard", sort_by, order.lower(), page, page_size, min_games, min_win_rate)
+    if entry := response_cache.get(key):
+        return cached_response(request, entry)
+    version = response_cache.version
     
-    # Apply filters
-    if min_games > 0:
-        query = query.filter(games_played__gte=min_games)
-    if min_win_rate > 0:
-        # Filter by win_rate (games_won / (games_won + games_lose))
-        query = query.filter(games_won__gt=0)
-    
-    # Count total before pagination
-    total_count = await query.count()
-    
-    # Apply sorting
-    sort_field = f"-{sort_by}" if order.lower() == "desc" else sort_by
-    query = query.order_by(sort_field)
-    
-    # Apply pagination
     offset = (page - 1) * page_size
-    users = await query.offset(offset).limit(page_size)
+    if rank_index.ready and min_games <= 0 and min_win_rate <= 0:
+        # Unfiltered pages come straight from the rank index, no OFFSET scan
+        total_count = len(rank_index)
+        user_ids = rank_index.page(
+            sort_by, offset, page_size, descending=order.lower() == "desc"
+        )
+        by_id = {u.user_id: u for u in await User.filter(user_id__in=user_ids)}
+        users = [by_id[user_id] for user_id in user_ids if user_id in by_id]
+    else:
+        # Build query
+        query = User.all()
+        
+        # Apply filters
+        if min_games > 0:
+            query = query.filter(games_played__gte=min_games)
+        if min_win_rate > 0:
+            query = query.filter(win_rate__gte=min_win_rate)
+        
+        # Count total before pagination
+        total_count = await query.count()
+        
+        # Apply sorting
+        sort_field = f"-{sort_by}" if order.lower() == "desc" else sort_by
+        query = query.order_by(sort_field)
+        
+        # Apply pagination
+        users = await query.offset(offset).limit(page_size)
     
     # Build leaderboard entries with ranks
     entries = []
@@ -1132,6 +2002,7 @@ async def get_leaderboard(
                 username=user.username,
                 display_name=user.display_name,
                 avatar_url=user.avatar_url,
+                avatar_variants=variant_urls(user.avatar_url, "avatar"),
                 games_won=user.games_won,
                 total_score=user.total_score,
                 best_streak=user.best_streak,
@@ -1141,18 +2012,20 @@ async def get_leaderboard(
             )
         )
     
-    # Apply win_rate filter post-fetch if needed
-    if min_win_rate > 0:
-        entries = [e for e in entries if e.win_rate >= min_win_rate]
+    total_pages = max(1, (total_count + page_size - 1) // page_size)
     
-    total_pages = (len(entries) + page_size - 1) // page_size if entries else 1
-    
-    return LeaderboardResponse(
-        entries=entries,
-        total_count=total_count,
-        page=page,
-        page_size=page_size,
-        total_pages=total_pages,
+    return cache_response(
+        request,
+        key,
+        LeaderboardResponse(
+            entries=entries,
+            total_count=total_count,
+            page=page,
+            page_size=page_size,
+            total_pages=total_pages,
+        ),
+        ["leaderboard"],
+        version,
     )
 
 
@@ -1160,6 +2033,7 @@ async def get_leaderboard(
 async def search_users(
     q: str = "",
     limit: int = 10,
+    offset: int = 0,
 ):
     """
     Search for users by username or display name.
@@ -1167,6 +2041,9 @@ async def search_users(
     Query Parameters:
     - q: Search query (searches username and display_name)
     - limit: Maximum results returned, max 50 (default: 10)
+    - offset: Results to skip, for paging (default: 0)
+    
+    Exact matches rank first, then prefix matches, then other substring matches.
     """
     if not q or len(q.strip()) < 2:
         raise HTTPException(
@@ -1176,66 +2053,125 @@ async def search_users(
     
     if limit < 1 or limit > 50:
         limit = 10
+    if offset < 0:
+        offset = 0
     
-    search_term = q.strip().lower()
-    
-    # Search in both username and display_name
-    users = await User.filter(
-        username__icontains=search_term
-    ).limit(limit * 2)  # Fetch more to filter display_name
-    
-    # Additional filter on display_name
-    results = []
-    for user in users:
-        if len(results) >= limit:
-            break
-        if (search_term in user.username.lower() or 
-            search_term in user.display_name.lower()):
-            results.append(
-                UserSearchResult(
-                    user_id=user.user_id,
-                    username=user.username,
-                    display_name=user.display_name,
-                    avatar_url=user.avatar_url,
-                    banner_url=user.banner_url,
-                    games_won=user.games_won,
-                    total_score=user.total_score,
-                    in_game=user.in_game,
-                    is_verified=user.is_verified,
-                )
-            )
+    if not search_index.ready:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Search is still loading",
+        )
+    user_ids, _ = search_index.search(q, offset, limit)
+    by_id = {user.user_id: user for user in await User.filter(user_id__in=user_ids)}
     
-    return results
+    return [
+        UserSearchResult(
+            user_id=user.user_id,
+            username=user.username,
+            display_name=user.display_name,
+            avatar_url=user.avatar_url,
+            banner_url=user.banner_url,
+            avatar_variants=variant_urls(user.avatar_url, "avatar"),
+            banner_variants=variant_urls(user.banner_url, "banner"),
+            games_won=user.games_won,
+            total_score=user.total_score,
+            in_game=apply_presence(user).in_game,
+            is_verified=user.is_verified,
+        )
+        for user_id in user_ids
+        if (user := by_id.get(user_id))
+    ]
 
 
 @api.get("/user/{username}/rank")
-async def get_user_rank(username: str, sort_by: str = "games_won"):
+async def get_user_rank(request: Request, username: str, sort_by: str = "games_won"):
     """
     Get a specific user's rank on the leaderboard.
     
     Query Parameters:
     - sort_by: 'games_won', 'total_score', 'best_streak', 'win_rate', 'average_score' (default: 'games_won')
     """
-    user = await User.get_or_none(username=username)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
     valid_sort_fields = {
         "games_won", "total_score", "best_streak", "win_rate", "average_score"
     }
     if sort_by not in valid_sort_fields:
         sort_by = "games_won"
     
-    # Count users ahead
-    sort_field = f"-{sort_by}" if sort_by in ["games_won", "total_score", "best_streak", "average_score"] else sort_by
-    users_ahead = await User.filter(**{f"{sort_by}__gt": getattr(user, sort_by)}).count()
+    key = ("rank", username, sort_by)
+    if entry := response_cache.get(key):
+        return cached_response(request, entry)
+    version = response_cache.version
     
-    return {
-        "username": user.username,
-        "rank": users_ahead + 1,
-        "sort_by": sort_by,
-        "stat_value": getattr(user, sort_by),
+    user = await User.get_or_none(username=username)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    rank = rank_index.rank(user.user_id, sort_by) if rank_index.ready else None
+    if rank is None:
+        # Count users ahead
+        users_ahead = await User.filter(**{f"{sort_by}__gt": getattr(user, sort_by)}).count()
+        rank = users_ahead + 1
+    
+    return cache_response(
+        request,
+        key,
+        {
+            "username": user.username,
+            "rank": rank,
+            "sort_by": sort_by,
+            "stat_value": getattr(user, sort_by),
+        },
+        ["leaderboard", f"user:{user.user_id}"],
+        version,
+    )
+
+
+@api.get("/user/{username}/around", response_model=List[LeaderboardEntry])
+async def get_players_around(username: str, sort_by: str = "games_won", radius: int = 5):
+    """
+    Get the players ranked just above and below a user.
+    
+    Query Parameters:
+    - sort_by: 'games_won', 'total_score', 'best_streak', 'win_rate', 'average_score', 'games_played' (default: 'games_won')
+    - radius: Players shown on each side of the user, max 25 (default: 5)
+    """
+    user = await User.get_or_none(username=username)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    if not rank_index.ready:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Leaderboard is still loading",
+        )
+    
+    if sort_by not in RankIndex.STATS:
+        sort_by = "games_won"
+    if radius < 1 or radius > 25:
+        radius = 5
+    
+    positions = rank_index.around(user.user_id, sort_by, radius)
+    by_id = {
+        u.user_id: u
+        for u in await User.filter(user_id__in=[user_id for _, user_id in positions])
     }
+    return [
+        LeaderboardEntry(
+            rank=rank,
+            user_id=entry.user_id,
+            username=entry.username,
+            display_name=entry.display_name,
+            avatar_url=entry.avatar_url,
+            avatar_variants=variant_urls(entry.avatar_url, "avatar"),
+            games_won=entry.games_won,
+            total_score=entry.total_score,
+            best_streak=entry.best_streak,
+            games_played=entry.games_played,
+            win_rate=entry.win_rate,
+            average_score=entry.average_score,
+        )
+        for rank, user_id in positions
+        if (entry := by_id.get(user_id))
+    ]
 
 
 @api.post("/auth/edit", response_model=UserResponse)
@@ -1253,61 +2189,182 @@ async def edit_user(edit: UserEdit, user: User = Depends(get_current_user)):
             raise HTTPException(400, detail="email is already used")
         user.email = edit.email
         fields_to_update.append("email")
+    # Each avatar/banner pointing at an upload holds one reference on it
+    acquired: list[Uploads] = []
+    released: list[Uploads] = []
     for field in ["avatar_url", "banner_url"]:
         new_value = getattr(edit, field)
         old_value = getattr(user, field)
-
-        if new_value and new_value != old_value:  # only delete if user is changing it
-            if old_value:
-                if PUBLIC_URL in old_value:
-                    upload = await Uploads.get_or_none(public_url=old_value)
-                    if upload:
-                        await storage.delete_file(upload.file_name)
-                        await upload.delete()
-                if DEBUG_URL in old_value:
-                    upload = await Uploads.get_or_none(dev_url=old_value)
-                    if upload:
-                        await storage.delete_file(upload.file_name)
-                        await upload.delete()
+        if new_value is None or new_value == old_value:
+            continue
+        upload = await find_upload(new_value)
+        if upload:
+            if not await acquire_upload(upload):
+                for taken in acquired:
+                    await delete_upload(taken)
+                raise HTTPException(409, detail="Image no longer exists, please upload it again")
+            acquired.append(upload)
+        if upload := await find_upload(old_value):
+            released.append(upload)
     for field in ["display_name", "avatar_url", "banner_url", "bio"]:
         value = getattr(edit, field)
         if value is not None:
             setattr(user, field, value)
             fields_to_update.append(field)
-    await user.save(update_fields=fields_to_update)
-    return user.export_data()
+    try:
+        await user.save(update_fields=fields_to_update)
+    except Exception:
+        for taken in acquired:
+            await delete_upload(taken)
+        raise
+    for upload in released:
+        await delete_upload(upload)
+    # Names and avatars show up on leaderboard entries
+    response_cache.invalidate("leaderboard")
+    return apply_presence(user).export_data()
 
     
 
 
+async def find_upload(url: Optional[str]) -> Optional[Uploads]:
+    """The upload a profile URL points at, if it is one of ours"""
+    if not url:
+        return None
+    if PUBLIC_URL and PUBLIC_URL in url:
+        return await Uploads.get_or_none(public_url=url)
+    if DEBUG_URL and DEBUG_URL in url:
+        return await Uploads.get_or_none(dev_url=url)
+    return None
+
+
+async def acquire_upload(upload: Uploads) -> bool:
+    """Take another profile reference on an upload; False if it was just deleted"""
+    return bool(await Uploads.filter(id=upload.id).update(ref_count=F("ref_count") + 1))
+
+
+async def delete_upload(upload: Uploads):
+    """Drop a reference, deleting the stored files with the last one"""
+    await Uploads.filter(id=upload.id).update(ref_count=F("ref_count") - 1)
+    if await Uploads.filter(id=upload.id, ref_count__lte=0).delete():
+        keys = list(upload.variants.values()) or [upload.file_name]
+        await asyncio.gather(*(storage.delete_file(key) for key in keys))
+
+
+def upload_url(upload: Uploads) -> JSONResponse:
+    return JSONResponse({"url": upload.public_url if not DEBUG else upload.dev_url})
+
+
 @api.post("/upload")
-async def upload_image(file: UploadFile):
+async def upload_image(file: UploadFile, kind: Optional[str] = None):
+    """
+    Upload an image, converted to WebP.
+    
+    Query Parameters:
+    - kind: 'avatar' or 'banner' to store every display size of it (default: one full-size image)
+    
+    Identical images are stored once: a repeat upload gets the existing URL
+    without being converted or uploaded again. The files are only counted as
+    used once /auth/edit puts the URL on a profile.
+    """
     if not file.content_type or not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="Only image uploads allowed.")
     if  file.size and file.size > 5_000_000:
         raise HTTPException(status_code=400, detail="File too large")
-
-    # convert to webp
-    webp_bytes = await convert_to_webp(file)
-
-    # generate unique filename
-    filename = f"{uuid.uuid4().hex}.webp"
-
-    # upload with StorageManager (runs in executor internally)
-    public_url, _, debug_url, unique_filename = await storage.upload_file(webp_bytes, filename, "profiles")
-    
-    await Uploads.create(public_url=public_url, dev_url=debug_url, file_name=unique_filename)
-
-    return JSONResponse({"url": public_url if not DEBUG else debug_url})
+    if kind is not None and kind not in IMAGE_VARIANTS:
+        raise HTTPException(status_code=400, detail="kind must be 'avatar' or 'banner'")
+    kind = kind or ""
+
+    data = await file.read()
+    source_hash = hashlib.sha256(data).hexdigest()
+    existing = await Uploads.get_or_none(source_hash=source_hash, kind=kind)
+    if existing:
+        return upload_url(existing)
+
+    # every size from one decode, or a single full-size webp
+    if kind:
+        outputs = await storage.convert_to_webp_variants(data, IMAGE_VARIANTS[kind])
+    else:
+        outputs = {0: await storage.convert_to_webp(data)}
+    content_hash = hashlib.sha256(outputs[max(outputs)].getvalue()).hexdigest()
+    existing = await Uploads.get_or_none(content_hash=content_hash, kind=kind)
+    if existing:
+        return upload_url(existing)
+
+    # upload with StorageManager (runs in executor internally); keys stay unique
+    # per upload so a file being deleted can never be one just re-uploaded
+    folder = f"profiles/{uuid.uuid4().hex}"
+    if kind:
+        uploaded = await asyncio.gather(
+            *(
+                storage.upload_file(webp, f"{size}.webp", folder, unique_name=False)
+                for size, webp in outputs.items()
+            )
+        )
+    else:
+        uploaded = [await storage.upload_file(outputs[0], f"{uuid.uuid4().hex}.webp", "profiles")]
+    by_size = dict(zip(outputs, uploaded))
+    public_url, _, debug_url, unique_filename = by_size[max(by_size)]
+    try:
+        upload = await Uploads.create(
+            public_url=public_url,
+            dev_url=debug_url,
+            file_name=unique_filename,
+            variants={str(size): result[3] for size, result in by_size.items()} if kind else {},
+            kind=kind,
+            source_hash=source_hash,
+            content_hash=content_hash,
+        )
+    except IntegrityError:
+        # The same image finished uploading concurrently; keep that copy
+        await asyncio.gather(*(storage.delete_file(result[3]) for result in uploaded))
+        upload = await Uploads.get_or_none(content_hash=content_hash, kind=kind)
+        if upload is None:
+            upload = await Uploads.get_or_none(source_hash=source_hash, kind=kind)
+        if upload is None:
+            raise HTTPException(status_code=409, detail="Upload conflicted, please retry")
+    return upload_url(upload)
 
 
 # Lobby endpoints
 @api.get("/lobbies")
-async def get_lobbies():
-    return {
-        "public_lobbies": LobbyManager.get_public_lobbies(),
-        "total_lobbies": len(LobbyManager.lobbies),
-    }
+async def get_lobbies(
+    request: Request, cursor: Optional[str] = None, limit: int = 0, name: str = ""
+):
+    """
+    List open public lobbies, oldest first.
+
+    Query Parameters:
+    - cursor: next_cursor from the previous page
+    - limit: Lobbies per page, max 100 (default: 0, the whole list)
+    - name: Only lobbies whose name starts with this, case-insensitive, ordered by name then age
+    """
+    if cursor or limit or name:
+        if limit < 1 or limit > 100:
+            limit = 20
+    key = ("lobbies", cursor, limit, name)
+    if entry := response_cache.get(key):
+        return cached_response(request, entry)
+    version = response_cache.version
+    if not cursor and not limit and not name:
+        return cache_response(
+            request, key, {**LobbyManager.snapshot(), "next_cursor": None}, ["lobbies"], version
+        )
+    try:
+        lobbies, next_cursor = LobbyManager.page_public_lobbies(cursor, limit, name)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return cache_response(
+        request,
+        key,
+        {
+            "version": LobbyManager.feed_version,
+            "public_lobbies": lobbies,
+            "total_lobbies": len(LobbyManager.lobbies),
+            "next_cursor": next_cursor,
+        },
+        ["lobbies"],
+        version,
+    )
 
 
 @api.get("/users/stats")
@@ -1320,7 +2377,7 @@ async def get_user_stats(current_user: User = Depends(get_current_user)):
     )
 
     return {
-        "user": current_user.export_data(),
+        "user": apply_presence(current_user).export_data(),
         "total_users": total_users,
         "recent_games": [
             {
@@ -1353,19 +2410,6 @@ async def websocket_game(websocket: WebSocket, token: str):
                 code=status.WS_1008_POLICY_VIOLATION, reason="User not found"
             )
             return
-        connection = ConnectionManager.get(user.user_id)
-        if connection:
-            await websocket.accept()
-            await websocket.send_json(
-                {
-                    "type": "connected_error",
-                    "message": "User already connected in another session.",
-                }
-            )
-            await websocket.close(
-                code=status.WS_1008_POLICY_VIOLATION, reason="User already connected"
-            )
-            return
         handler = GameWebSocket(websocket, user)
         await handler.start()
 
@@ -1380,4 +2424,19 @@ app.include_router(api)
 # Health check endpoint
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": utcnow().isoformat()}
+    return {
+        "status": "healthy",
+        "timestamp": utcnow().isoformat(),
+        "websockets": ConnectionManager.stats(),
+        "lobby_feed": GameWebSocket.lobby_feed.stats(),
+        "lobby_reaper": lobby_reaper.stats(),
+        "user_cache": user_cache.stats(),
+        "token_cache": token_cache.stats(),
+        "password_pool": password_pool.stats(),
+        "email_outbox": email_outbox.stats(),
+        "presence": presence.stats(),
+        "rank_index": rank_index.stats(),
+        "response_cache": response_cache.stats(),
+        "search_index": search_index.stats(),
+        "storage": storage.stats(),
+    }
@@ -0,0 +1,21 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "users" ADD "win_rate" DOUBLE PRECISION NOT NULL DEFAULT 0;
+        ALTER TABLE "users" ADD "average_score" DOUBLE PRECISION NOT NULL DEFAULT 0;
+        UPDATE "users"
+            SET "win_rate" = "games_won" * 100.0 / ("games_won" + "games_lose"),
+                "average_score" = "total_score" * 1.0 / ("games_won" + "games_lose")
+            WHERE "games_won" + "games_lose" > 0;
+        CREATE INDEX "idx_users_win_rate" ON "users" ("win_rate");
+        CREATE INDEX "idx_users_average_score" ON "users" ("average_score");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_users_win_rate";
+        DROP INDEX IF EXISTS "idx_users_average_score";
+        ALTER TABLE "users" DROP COLUMN "win_rate";
+        ALTER TABLE "users" DROP COLUMN "average_score";"""
@@ -0,0 +1,25 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE INDEX "idx_users_display_name" ON "users" ("display_name");
+        CREATE INDEX "idx_users_games_played" ON "users" ("games_played");
+        CREATE INDEX "idx_users_games_won" ON "users" ("games_won");
+        CREATE INDEX "idx_users_total_score" ON "users" ("total_score");
+        CREATE INDEX "idx_users_best_streak" ON "users" ("best_streak");
+        CREATE INDEX "idx_game_sessions_lobby_id" ON "game_sessions" ("lobby_id");
+        CREATE INDEX "idx_game_sessions_status" ON "game_sessions" ("status");
+        CREATE INDEX "idx_game_sessions_creator_id_created_at" ON "game_sessions" ("creator_id", "created_at");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_users_display_name";
+        DROP INDEX IF EXISTS "idx_users_games_played";
+        DROP INDEX IF EXISTS "idx_users_games_won";
+        DROP INDEX IF EXISTS "idx_users_total_score";
+        DROP INDEX IF EXISTS "idx_users_best_streak";
+        DROP INDEX IF EXISTS "idx_game_sessions_lobby_id";
+        DROP INDEX IF EXISTS "idx_game_sessions_status";
+        DROP INDEX IF EXISTS "idx_game_sessions_creator_id_created_at";"""
@@ -0,0 +1,22 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "uploads" ADD "kind" VARCHAR(20) NOT NULL DEFAULT '';
+        ALTER TABLE "uploads" ADD "source_hash" VARCHAR(64);
+        ALTER TABLE "uploads" ADD "content_hash" VARCHAR(64);
+        ALTER TABLE "uploads" ADD "ref_count" INT NOT NULL DEFAULT 1;
+        ALTER TABLE "uploads" ALTER COLUMN "ref_count" SET DEFAULT 0;
+        CREATE UNIQUE INDEX "uid_uploads_source_hash_kind" ON "uploads" ("source_hash", "kind");
+        CREATE UNIQUE INDEX "uid_uploads_content_hash_kind" ON "uploads" ("content_hash", "kind");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "uid_uploads_source_hash_kind";
+        DROP INDEX IF EXISTS "uid_uploads_content_hash_kind";
+        ALTER TABLE "uploads" DROP COLUMN "kind";
+        ALTER TABLE "uploads" DROP COLUMN "source_hash";
+        ALTER TABLE "uploads" DROP COLUMN "content_hash";
+        ALTER TABLE "uploads" DROP COLUMN "ref_count";"""
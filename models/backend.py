@@ -0,0 +1,324 @@
+from __future__ import annotations
+from typing import Any, Awaitable, Callable, Optional
+import asyncio
+import json
+import logging
+import time
+import uuid
+
+try:
+    from redis import asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+
+EventHandler = Callable[[dict], Awaitable[None]]
+# part name -> [version, value] of a shared lobby, see RedisLobbyBackend
+LobbyParts = dict[str, list]
+
+
+def _text(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class LobbyBackend:
+    """In-process backend: lobbies and connections only live in this worker.
+
+    The sharing hooks are no-ops and session leases are kept in a dict, so
+    a single worker behaves exactly as if there was no backend at all.
+    """
+
+    shared = False
+
+    def __init__(self) -> None:
+        self.logger = logging.getLogger(__name__)
+        self.worker_id = uuid.uuid4().hex[:12]
+        # user_id -> (session token, lease expiry on the monotonic clock)
+        self.presence: dict[str, tuple[str, float]] = {}
+
+    async def start(self, handler: EventHandler) -> dict[str, LobbyParts]:
+        """Start receiving events from other workers and return the lobbies already shared"""
+        return {}
+
+    async def stop(self) -> None:
+        pass
+
+    async def save_lobby(self, lobby_id: str, parts: dict[str, Any], create: bool = False) -> bool:
+        """Write the changed parts of a lobby; False if it was deleted meanwhile"""
+        return True
+
+    async def delete_lobby(self, lobby_id: str) -> None:
+        pass
+
+    async def relay_lobby(self, lobby_id: str, payload: str, exclude: list[str]) -> None:
+        """Forward an encoded lobby broadcast to the members connected to other workers"""
+        pass
+
+    async def relay_user(self, user_id: str, payload: str, kick: bool = False) -> None:
+        """Forward an encoded message to a user connected to another worker"""
+        pass
+
+    async def publish_users(self, user_ids: list[str], deleted: bool = False, renamed: bool = False) -> None:
+        """Tell other workers these users' rows changed so they refresh their copies"""
+        pass
+
+    async def claim_presence(self, user_id: str, token: str, ttl: float) -> bool:
+        """Take the user's session lease unless another live session holds it"""
+        now = time.monotonic()
+        holder = self.presence.get(user_id)
+        if holder and holder[0] != token and holder[1] > now:
+            return False
+        self.presence[user_id] = (token, now + ttl)
+        return True
+
+    async def renew_presence(self, user_id: str, token: str, ttl: float) -> bool:
+        """Extend the lease; False means it expired and another session took it"""
+        return await self.claim_presence(user_id, token, ttl)
+
+    async def release_presence(self, user_id: str, token: str) -> None:
+        holder = self.presence.get(user_id)
+        if holder and holder[0] == token:
+            self.presence.pop(user_id, None)
+
+    async def live_presence(self, user_ids: list[str]) -> set[str]:
+        """The users holding a live session lease on any worker"""
+        now = time.monotonic()
+        return {
+            user_id
+            for user_id in user_ids
+            if (holder := self.presence.get(user_id)) and holder[1] > now
+        }
+
+    async def live_workers(self, worker_ids: list[str]) -> set[str]:
+        """The workers that are still running"""
+        return {worker_id for worker_id in worker_ids if worker_id == self.worker_id}
+
+
+class RedisLobbyBackend(LobbyBackend):
+    """Shares lobby state in Redis and relays events over pub/sub.
+
+    A lobby is a hash of parts, its own fields under "lobby" and each
+    player under "player:<user_id>", so two workers changing different
+    players at the same time don't overwrite each other. Every write bumps
+    the version of the parts it touches and workers only apply a part
+    newer than the one they hold, so all copies converge whatever order
+    the events arrive in.
+
+    Each worker also holds a lease key while it runs; lobbies created on a
+    worker that is gone can then be told apart and reaped by the others.
+
+    Any redis.asyncio compatible client works, so tests can hand several
+    instances clients on the same fakeredis server to act as separate
+    workers without a real Redis.
+    """
+
+    shared = True
+    LOBBIES_KEY = "khawawish:lobby_ids"
+    LOBBY_KEY = "khawawish:lobby:{}"
+    EVENTS_CHANNEL = "khawawish:events"
+    PRESENCE_KEY = "khawawish:presence:{}"
+    WORKER_KEY = "khawawish:worker:{}"
+    WORKER_TTL = 30
+    # Bump and write each part, unless the lobby was deleted and this isn't its creation
+    SAVE_SCRIPT = """
+    if ARGV[2] == '0' and redis.call('exists', KEYS[1]) == 0 then
+        return false
+    end
+    local versions = {}
+    for i = 3, #ARGV, 2 do
+        versions[#versions + 1] = redis.call('hincrby', KEYS[1], '#' .. ARGV[i], 1)
+        redis.call('hset', KEYS[1], ARGV[i], ARGV[i + 1])
+    end
+    redis.call('sadd', KEYS[2], ARGV[1])
+    return versions
+    """
+    # Only touch the lease if this session still holds it
+    RENEW_SCRIPT = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('pexpire', KEYS[1], ARGV[2])
+    end
+    return 0
+    """
+    RELEASE_SCRIPT = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('del', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, client: Any) -> None:
+        super().__init__()
+        self.client = client
+        self.pubsub: Any = None
+        self.listener: Optional[asyncio.Task] = None
+        self.keepalive: Optional[asyncio.Task] = None
+        # lobby_id -> part -> version of the copy this worker holds
+        self.versions: dict[str, dict[str, int]] = {}
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisLobbyBackend":
+        if aioredis is None:
+            raise RuntimeError("The redis package is required to use a shared lobby backend")
+        return cls(aioredis.from_url(url))
+
+    async def start(self, handler: EventHandler) -> dict[str, LobbyParts]:
+        await self._renew_worker()
+        self.keepalive = asyncio.create_task(self._keep_alive())
+        self.pubsub = self.client.pubsub()
+        await self.pubsub.subscribe(self.EVENTS_CHANNEL)
+        self.listener = asyncio.create_task(self._listen(handler))
+        lobbies = {}
+        for lobby_id in map(_text, await self.client.smembers(self.LOBBIES_KEY)):
+            fields = {
+                _text(field): _text(value)
+                for field, value in (await self.client.hgetall(self.LOBBY_KEY.format(lobby_id))).items()
+            }
+            if "lobby" not in fields:
+                continue
+            parts = {
+                part: [int(fields["#" + part]), json.loads(value)]
+                for part, value in fields.items()
+                if not part.startswith("#")
+            }
+            self.versions[lobby_id] = {part: version for part, (version, _) in parts.items()}
+            lobbies[lobby_id] = parts
+        return lobbies
+
+    async def stop(self) -> None:
+        for task in (self.listener, self.keepalive):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self.listener = self.keepalive = None
+        if self.pubsub:
+            await self.pubsub.unsubscribe(self.EVENTS_CHANNEL)
+            await self.pubsub.close()
+            self.pubsub = None
+        await self.client.delete(self.WORKER_KEY.format(self.worker_id))
+
+    async def _renew_worker(self) -> None:
+        await self.client.set(self.WORKER_KEY.format(self.worker_id), 1, px=self.WORKER_TTL * 1000)
+
+    async def _keep_alive(self) -> None:
+        while True:
+            await asyncio.sleep(self.WORKER_TTL / 3)
+            try:
+                await self._renew_worker()
+            except Exception as e:
+                self.logger.warning(f"Worker lease renewal failed: {e}")
+
+    async def _listen(self, handler: EventHandler) -> None:
+        async for message in self.pubsub.listen():
+            if message.get("type") != "message":
+                continue
+            event = json.loads(message["data"])
+            if event.get("worker") == self.worker_id:
+                continue
+            if event.get("kind") == "lobby":
+                self._merge(event)
+            elif event.get("kind") == "lobby_deleted":
+                self.versions.pop(event["lobby_id"], None)
+            try:
+                await handler(event)
+            except Exception as e:
+                self.logger.warning(f"Failed to handle backend event {event.get('kind')}: {e}")
+
+    def _merge(self, event: dict) -> None:
+        """Keep only the parts newer than this worker's copy in a lobby event.
+
+        Also flags the event "stale" when this worker holds a part newer
+        than the sender had seen: the broadcast the sender relayed along
+        with this change showed an outdated lobby.
+        """
+        held = self.versions.setdefault(event["lobby_id"], {})
+        parts = {}
+        for part, (version, value) in event["parts"].items():
+            if version > held.get(part, 0):
+                held[part] = version
+                parts[part] = value
+        seen = event["seen"]
+        event["parts"] = parts
+        event["stale"] = any(
+            version > seen.get(part, 0) for part, version in held.items() if part not in parts
+        )
+
+    async def _publish(self, event: dict) -> None:
+        event["worker"] = self.worker_id
+        await self.client.publish(self.EVENTS_CHANNEL, json.dumps(event))
+
+    async def save_lobby(self, lobby_id: str, parts: dict[str, Any], create: bool = False) -> bool:
+        args = [lobby_id, int(create)]
+        for part, value in parts.items():
+            args += [part, json.dumps(value)]
+        versions = await self.client.eval(
+            self.SAVE_SCRIPT, 2, self.LOBBY_KEY.format(lobby_id), self.LOBBIES_KEY, *args
+        )
+        if versions is None:
+            return False
+        held = self.versions.setdefault(lobby_id, {})
+        held.update(zip(parts, map(int, versions)))
+        await self._publish(
+            {
+                "kind": "lobby",
+                "lobby_id": lobby_id,
+                "parts": {part: [held[part], value] for part, value in parts.items()},
+                "seen": held,
+            }
+        )
+        return True
+
+    async def delete_lobby(self, lobby_id: str) -> None:
+        await self.client.delete(self.LOBBY_KEY.format(lobby_id))
+        await self.client.srem(self.LOBBIES_KEY, lobby_id)
+        self.versions.pop(lobby_id, None)
+        await self._publish({"kind": "lobby_deleted", "lobby_id": lobby_id})
+
+    async def relay_lobby(self, lobby_id: str, payload: str, exclude: list[str]) -> None:
+        await self._publish(
+            {"kind": "relay", "lobby_id": lobby_id, "payload": payload, "exclude": exclude}
+        )
+
+    async def relay_user(self, user_id: str, payload: str, kick: bool = False) -> None:
+        await self._publish({"kind": "user", "user_id": user_id, "payload": payload, "kick": kick})
+
+    async def publish_users(self, user_ids: list[str], deleted: bool = False, renamed: bool = False) -> None:
+        await self._publish(
+            {"kind": "users", "user_ids": user_ids, "deleted": deleted, "renamed": renamed}
+        )
+
+    async def claim_presence(self, user_id: str, token: str, ttl: float) -> bool:
+        key = self.PRESENCE_KEY.format(user_id)
+        if await self.client.set(key, token, nx=True, px=int(ttl * 1000)):
+            return True
+        return await self.renew_presence(user_id, token, ttl)
+
+    async def renew_presence(self, user_id: str, token: str, ttl: float) -> bool:
+        key = self.PRESENCE_KEY.format(user_id)
+        return bool(await self.client.eval(self.RENEW_SCRIPT, 1, key, token, int(ttl * 1000)))
+
+    async def release_presence(self, user_id: str, token: str) -> None:
+        await self.client.eval(self.RELEASE_SCRIPT, 1, self.PRESENCE_KEY.format(user_id), token)
+
+    async def live_presence(self, user_ids: list[str]) -> set[str]:
+        if not user_ids:
+            return set()
+        leases = await self.client.mget([self.PRESENCE_KEY.format(user_id) for user_id in user_ids])
+        return {user_id for user_id, lease in zip(user_ids, leases) if lease is not None}
+
+    async def live_workers(self, worker_ids: list[str]) -> set[str]:
+        if not worker_ids:
+            return set()
+        leases = await self.client.mget([self.WORKER_KEY.format(worker_id) for worker_id in worker_ids])
+        return {worker_id for worker_id, lease in zip(worker_ids, leases) if lease is not None}
+
+
+def get_lobby_backend(url: str = "") -> LobbyBackend:
+    """Pick the backend for LOBBY_BACKEND_URL; empty keeps everything in-process"""
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisLobbyBackend.from_url(url)
+    if url:
+        raise ValueError(f"Unsupported lobby backend URL: {url}")
+    return LobbyBackend()
@@ -0,0 +1,121 @@
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Any, Generic, Hashable, Iterable, Optional, TypeVar
+import hashlib
+import time
+
+T = TypeVar("T")
+
+
+class TTLCache(Generic[T]):
+    """Bounded LRU cache whose entries also expire after a time-to-live"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, T]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[T]:
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: T, ttl: Optional[float] = None) -> None:
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class CachedResponse:
+    __slots__ = ("body", "etag", "tags", "version")
+
+    def __init__(self, body: bytes, etag: str, tags: tuple[str, ...], version: int) -> None:
+        self.body = body
+        self.etag = etag
+        self.tags = tags
+        self.version = version
+
+
+class ResponseCache:
+    """Serialized response bodies with ETags, invalidated by tag.
+
+    invalidate() advances a global version and stamps each tag with it.
+    An entry remembers the version read before its data was queried, and
+    is only valid while none of its tags were invalidated after that, so
+    invalidating a tag retires all of its entries without scanning the
+    cache, including ones still being computed when it happened.
+    """
+
+    def __init__(self, maxsize: int = 4096, ttl: float = 5) -> None:
+        self.entries: TTLCache[CachedResponse] = TTLCache(maxsize=maxsize, ttl=ttl)
+        # tag -> version of its last invalidation
+        self.generations: dict[str, int] = {}
+        self.invalidations = 0
+        self.not_modified = 0
+
+    @property
+    def ttl(self) -> float:
+        return self.entries.ttl
+
+    @property
+    def version(self) -> int:
+        """Read before computing a response and pass it to set()"""
+        return self.invalidations
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if any(self.generations.get(tag, 0) > entry.version for tag in entry.tags):
+            self.entries.pop(key)
+            return None
+        return entry
+
+    def set(self, key: Hashable, body: bytes, tags: Iterable[str], version: int) -> CachedResponse:
+        entry = CachedResponse(
+            body,
+            f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"',
+            tuple(tags),
+            version,
+        )
+        self.entries.set(key, entry)
+        return entry
+
+    def invalidate(self, *tags: str) -> None:
+        self.invalidations += 1
+        for tag in tags:
+            self.generations[tag] = self.invalidations
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            **self.entries.stats(),
+            "invalidations": self.invalidations,
+            "not_modified": self.not_modified,
+        }
@@ -6,6 +6,28 @@ from tortoise import fields
 from datetime import datetime
 
 
+# Sizes (longest edge, px) generated for each kind of profile image upload
+IMAGE_VARIANTS: dict[str, tuple[int, ...]] = {
+    "avatar": (64, 256),
+    "banner": (640, 1600),
+}
+
+
+def variant_urls(url: Optional[str], kind: str) -> dict[str, str]:
+    """URLs of every stored size of an uploaded image, keyed by size.
+
+    Variants live next to each other as <folder>/<size>.webp and the
+    profile stores the largest one, so the others are derived from it.
+    Images that weren't uploaded as variants have none.
+    """
+    sizes = IMAGE_VARIANTS[kind]
+    suffix = f"/{max(sizes)}.webp"
+    if not url or not url.endswith(suffix):
+        return {}
+    base = url[: -len(suffix)]
+    return {str(size): f"{base}/{size}.webp" for size in sizes}
+
+
 class UserResponse(BaseModel):
     user_id: str
     username: str
@@ -13,6 +35,8 @@ class UserResponse(BaseModel):
     display_name: Optional[str] = None
     avatar_url: Optional[str] = None
     banner_url: Optional[str] = None
+    avatar_variants: dict[str, str] = {}
+    banner_variants: dict[str, str] = {}
     bio: Optional[str] = None
     games_played: int = 0
     games_won: int = 0
@@ -35,8 +59,21 @@ class Uploads(Model):
     public_url = fields.CharField(max_length=500, unique=True)
     dev_url = fields.CharField(max_length=500, unique=True)
     file_name = fields.CharField(max_length=500, unique=True)
+    # size -> storage key of every derivative, e.g. {"64": "profiles/<id>/64.webp"}
+    variants = fields.JSONField(default=dict)
+    # "avatar"/"banner" for variant uploads, "" for a single full-size image
+    kind = fields.CharField(max_length=20, default="")
+    # sha256 of the uploaded bytes and of the (largest) WebP produced from them
+    source_hash = fields.CharField(max_length=64, null=True)
+    content_hash = fields.CharField(max_length=64, null=True)
+    # Profile avatars/banners using this image; its files are deleted when the
+    # last one is replaced
+    ref_count = fields.IntField(default=0)
     created_at = fields.DatetimeField(auto_now_add=True)
 
+    class Meta:
+        unique_together = (("source_hash", "kind"), ("content_hash", "kind"))
+
 class User(Model):
     """User model for authentication and game statistics"""
 
@@ -44,7 +81,7 @@ class User(Model):
     username = fields.CharField(max_length=50, unique=True)
     email = fields.CharField(max_length=100, unique=True)
     password_hash = fields.CharField(max_length=255)
-    display_name = fields.CharField(max_length=100)
+    display_name = fields.CharField(max_length=100, index=True)
 
     # Profile info
     avatar_url = fields.CharField(max_length=500, null=True)
@@ -52,13 +89,17 @@ class User(Model):
     bio = fields.TextField(null=True)
 
     # Game statistics
-    games_played = fields.IntField(default=0)
-    games_won = fields.IntField(default=0)
+    games_played = fields.IntField(default=0, index=True)
+    games_won = fields.IntField(default=0, index=True)
     games_lose = fields.IntField(default=0)
-    total_score = fields.IntField(default=0)
-    best_streak = fields.IntField(default=0)
+    total_score = fields.IntField(default=0, index=True)
+    best_streak = fields.IntField(default=0, index=True)
     current_streak = fields.IntField(default=0)
     in_game = fields.BooleanField(default=False)
+    # Derived from the counters above and kept up to date by models.stats,
+    # so the leaderboard can filter and sort on them in SQL
+    win_rate = fields.FloatField(default=0, index=True)
+    average_score = fields.FloatField(default=0, index=True)
 
     # Account status
     is_active = fields.BooleanField(default=True)
@@ -88,6 +129,8 @@ class User(Model):
             display_name=self.display_name,
             avatar_url=self.avatar_url,
             banner_url=self.banner_url,
+            avatar_variants=variant_urls(self.avatar_url, "avatar"),
+            banner_variants=variant_urls(self.banner_url, "banner"),
             bio=self.bio,
             games_played=self.games_played,
             games_won=self.games_won,
@@ -109,20 +152,6 @@ class User(Model):
             return data.model_dump()
         return data
 
-    @property
-    def win_rate(self) -> float:
-        total_resolved = self.games_won + self.games_lose
-        if self.games_played == 0 or total_resolved == 0:
-            return 0.0
-        return (self.games_won / total_resolved) * 100
-
-    @property
-    def average_score(self) -> float:
-        total_resolved = self.games_won + self.games_lose
-        if self.games_played == 0 or total_resolved == 0:
-            return 0.0
-        return self.total_score / total_resolved
-
 
 class GameSessionStatus(StrEnum):
     """Enum for game session status"""
@@ -137,7 +166,7 @@ class GameSession(Model):
     """Model to track game sessions/lobbies"""
 
     session_id = fields.CharField(max_length=50, pk=True)
-    lobby_id = fields.CharField(max_length=20)
+    lobby_id = fields.CharField(max_length=20, index=True)
     creator_id = fields.CharField(max_length=50)
 
     # Game configuration
@@ -147,7 +176,9 @@ class GameSession(Model):
     )  # Store game settings like max_images, seed, etc.
 
     # Game state
-    status = fields.CharEnumField(enum_type=GameSessionStatus, default="in_progress")
+    status = fields.CharEnumField(
+        enum_type=GameSessionStatus, default="in_progress", index=True
+    )
     started_at = fields.DatetimeField(null=True)
     ended_at = fields.DatetimeField(null=True)
     winner_id = fields.CharField(max_length=50, null=True)
@@ -158,7 +189,42 @@ class GameSession(Model):
 
     class Meta:
         table = "game_sessions"
+        # A player's recent games: WHERE creator_id = ? ORDER BY created_at DESC
+        indexes = (("creator_id", "created_at"),)
 
     def __str__(self):
         return f"GameSession({self.lobby_id} - {self.status})"
 
+
+class EmailStatus(StrEnum):
+    """Enum for outgoing email delivery status"""
+
+    PENDING = "pending"
+    SENDING = "sending"  # claimed by a worker until next_attempt_at
+    SENT = "sent"
+    FAILED = "failed"
+
+
+class OutgoingEmail(Model):
+    """Email waiting in (or delivered from) the outbox, kept so restarts don't lose mail"""
+
+    id = fields.BigIntField(pk=True)
+    to_email = fields.CharField(max_length=100)
+    subject = fields.CharField(max_length=255)
+    body = fields.TextField()
+
+    # Delivery state
+    status = fields.CharEnumField(enum_type=EmailStatus, default=EmailStatus.PENDING)
+    attempts = fields.IntField(default=0)
+    next_attempt_at = fields.DatetimeField()
+    last_error = fields.TextField(null=True)
+
+    # Timestamps
+    created_at = fields.DatetimeField(auto_now_add=True)
+    updated_at = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        table = "outgoing_emails"
+
+    def __str__(self):
+        return f"OutgoingEmail({self.to_email} - {self.status})"
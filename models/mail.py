@@ -0,0 +1,211 @@
+from __future__ import annotations
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+import asyncio
+import logging
+import smtplib
+
+from models.game import EmailStatus, OutgoingEmail
+
+
+class SMTPConfig:
+    def __init__(
+        self,
+        server: str,
+        port: int,
+        user: str,
+        password: str,
+        from_addr: str,
+        starttls: bool = True,
+    ) -> None:
+        self.server = server
+        self.port = port
+        self.user = user
+        self.password = password
+        self.from_addr = from_addr
+        self.starttls = starttls
+
+
+class EmailOutbox:
+    """Persistent outgoing mail queue delivered over one reused SMTP connection.
+
+    Messages are stored in the outgoing_emails table before anything is
+    sent, so a restart picks up where it left off. A single worker task
+    sends due messages in batches; failures are retried with exponential
+    backoff until max_attempts is reached.
+
+    Every worker runs an outbox against the same table, so each message is
+    claimed with a conditional UPDATE before it is sent. A claim is a lease
+    that runs until next_attempt_at; if its worker dies, the message is
+    picked up again once the lease runs out.
+    """
+
+    def __init__(
+        self,
+        config: SMTPConfig,
+        batch_size: int = 20,
+        max_attempts: int = 5,
+        retry_delay: float = 5,
+        poll_interval: float = 30,
+        claim_lease: float = 600,
+    ) -> None:
+        self.logger = logging.getLogger(__name__)
+        self.config = config
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.poll_interval = poll_interval
+        self.claim_lease = claim_lease
+        # smtplib is blocking, and the connection is only ever touched from this one thread
+        self._smtp_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="smtp")
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.failed = 0
+
+    async def enqueue(self, to_email: str, subject: str, body: str) -> OutgoingEmail:
+        """Store a message for delivery and wake the sender"""
+        email = await OutgoingEmail.create(
+            to_email=to_email,
+            subject=subject,
+            body=body,
+            next_attempt_at=datetime.now(timezone.utc),
+        )
+        self._wakeup.set()
+        return email
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._smtp_executor, self._disconnect)
+        self._smtp_executor.shutdown(wait=True)
+
+    async def _run(self) -> None:
+        while True:
+            # Cleared before flushing so an enqueue() during the flush isn't lost
+            self._wakeup.clear()
+            try:
+                delivered = await self.flush()
+            except Exception as e:
+                self.logger.error(f"Email outbox error: {e}")
+                delivered = 0
+            if delivered < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def flush(self) -> int:
+        """Send one batch of due messages, returning how many were attempted"""
+        now = datetime.now(timezone.utc)
+        due = (
+            await OutgoingEmail.filter(
+                status__in=[EmailStatus.PENDING, EmailStatus.SENDING],
+                next_attempt_at__lte=now,
+            )
+            .order_by("id")
+            .limit(self.batch_size)
+        )
+        if not due:
+            return 0
+
+        # Claim each message; only one worker's UPDATE can match the row
+        lease_until = now + timedelta(seconds=self.claim_lease)
+        batch = []
+        for email in due:
+            claimed = await OutgoingEmail.filter(
+                id=email.id, status=email.status, next_attempt_at__lte=now
+            ).update(status=EmailStatus.SENDING, next_attempt_at=lease_until)
+            if claimed:
+                batch.append(email)
+        if not batch:
+            return len(due)
+
+        loop = asyncio.get_running_loop()
+        errors = await loop.run_in_executor(self._smtp_executor, self._send_batch, batch)
+
+        now = datetime.now(timezone.utc)
+        for email, error in zip(batch, errors):
+            email.attempts += 1
+            if error is None:
+                email.status = EmailStatus.SENT
+                email.last_error = None
+                self.sent += 1
+            else:
+                email.last_error = error
+                if email.attempts >= self.max_attempts:
+                    email.status = EmailStatus.FAILED
+                    self.failed += 1
+                    self.logger.error(f"Giving up on email to {email.to_email}: {error}")
+                else:
+                    delay = self.retry_delay * 2 ** (email.attempts - 1)
+                    email.status = EmailStatus.PENDING
+                    email.next_attempt_at = now + timedelta(seconds=delay)
+            await email.save(update_fields=["attempts", "status", "last_error", "next_attempt_at"])
+        return len(batch)
+
+    def _send_batch(self, batch: list[OutgoingEmail]) -> list[Optional[str]]:
+        """Send each message over the shared connection (runs on the SMTP thread)"""
+        errors: list[Optional[str]] = []
+        for email in batch:
+            message = self._build_message(email)
+            try:
+                self._send(email.to_email, message)
+                errors.append(None)
+            except Exception as e:
+                self.logger.warning(f"Failed to send email to {email.to_email}: {e}")
+                self._disconnect()
+                errors.append(str(e))
+        return errors
+
+    def _send(self, to_email: str, message: str) -> None:
+        try:
+            self._connection().sendmail(self.config.user, to_email, message)
+        except smtplib.SMTPServerDisconnected:
+            # The server dropped an idle connection, reconnect once and retry
+            self._smtp = None
+            self._connection().sendmail(self.config.user, to_email, message)
+
+    def _build_message(self, email: OutgoingEmail) -> str:
+        msg = MIMEMultipart()
+        msg["From"] = self.config.from_addr
+        msg["To"] = email.to_email
+        msg["Subject"] = email.subject
+        msg.attach(MIMEText(email.body, "html"))
+        return msg.as_string()
+
+    def _connection(self) -> smtplib.SMTP:
+        if self._smtp is None:
+            smtp = smtplib.SMTP(self.config.server, self.config.port, timeout=30)
+            if self.config.starttls:
+                smtp.starttls()
+            if self.config.user and self.config.password:
+                smtp.login(self.config.user, self.config.password)
+            self._smtp = smtp
+        return self._smtp
+
+    def _disconnect(self) -> None:
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except Exception:
+            pass
+        self._smtp = None
+
+    def stats(self) -> dict:
+        return {"sent": self.sent, "failed": self.failed, "connected": self._smtp is not None}
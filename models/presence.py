@@ -0,0 +1,82 @@
+from __future__ import annotations
+from typing import Callable, Optional
+import asyncio
+import logging
+
+from models.game import User
+
+
+class PresenceBuffer:
+    """Write-behind buffer for the users.in_game flag.
+
+    Lobby churn flips in_game constantly; instead of one UPDATE per flip the
+    latest value per user is kept here and written in two batched UPDATEs
+    every flush_interval seconds and on shutdown.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = 5,
+        on_flush: Optional[Callable[[list[str]], None]] = None,
+    ) -> None:
+        self.logger = logging.getLogger(__name__)
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self.pending: dict[str, bool] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.changes = 0
+        self.rows_written = 0
+
+    def set(self, user_id: str, in_game: bool) -> None:
+        self.pending[user_id] = in_game
+        self.changes += 1
+
+    def get(self, user_id: str, default: bool) -> bool:
+        """Latest in_game value for a user, falling back to the stored one"""
+        return self.pending.get(user_id, default)
+
+    async def flush(self) -> None:
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, {}
+        try:
+            for in_game in (True, False):
+                user_ids = [uid for uid, value in pending.items() if value is in_game]
+                if user_ids:
+                    await User.filter(user_id__in=user_ids).update(in_game=in_game)
+        except Exception:
+            # Keep the unwritten values, unless something newer came in meanwhile
+            self.pending = {**pending, **self.pending}
+            raise
+        self.rows_written += len(pending)
+        if self.on_flush:
+            self.on_flush(list(pending))
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                self.logger.warning(f"Failed to flush in_game updates: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self.pending),
+            "changes": self.changes,
+            "rows_written": self.rows_written,
+        }
@@ -0,0 +1,96 @@
+from __future__ import annotations
+from typing import Iterable, Optional
+import logging
+
+from sortedcontainers import SortedList
+
+from models.game import User
+
+
+class RankIndex:
+    """In-memory order-statistic index of every user's leaderboard stats.
+
+    Each stat keeps a SortedList of (-value, user_id), so rank lookups,
+    rank-range pages and "players around me" are O(log n) instead of a
+    COUNT(*) or a deep OFFSET scan. Built from the users table at startup
+    and refreshed for the players touched by each game-result write.
+    """
+
+    STATS = ("games_won", "total_score", "best_streak", "games_played", "win_rate", "average_score")
+
+    def __init__(self) -> None:
+        self.logger = logging.getLogger(__name__)
+        self.ready = False
+        self._lists: dict[str, SortedList] = {stat: SortedList() for stat in self.STATS}
+        self._values: dict[str, dict[str, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._values
+
+    async def build(self) -> None:
+        rows = await User.all().values("user_id", *self.STATS)
+        self._values = {row.pop("user_id"): row for row in rows}
+        self._lists = {
+            stat: SortedList((-values[stat], user_id) for user_id, values in self._values.items())
+            for stat in self.STATS
+        }
+        self.ready = True
+        self.logger.info(f"Built rank index for {len(self._values)} users")
+
+    async def refresh(self, user_ids: Iterable[str]) -> None:
+        """Reload the stats of a few users from the database"""
+        rows = await User.filter(user_id__in=list(user_ids)).values("user_id", *self.STATS)
+        for row in rows:
+            self.update(row.pop("user_id"), row)
+
+    def update(self, user_id: str, values: dict[str, float]) -> None:
+        old = self._values.get(user_id)
+        for stat in self.STATS:
+            if old is not None:
+                self._lists[stat].discard((-old[stat], user_id))
+            self._lists[stat].add((-values[stat], user_id))
+        self._values[user_id] = {stat: values[stat] for stat in self.STATS}
+
+    def remove(self, user_id: str) -> None:
+        old = self._values.pop(user_id, None)
+        if old is not None:
+            for stat in self.STATS:
+                self._lists[stat].discard((-old[stat], user_id))
+
+    def value(self, user_id: str, stat: str) -> Optional[float]:
+        values = self._values.get(user_id)
+        return values[stat] if values else None
+
+    def rank(self, user_id: str, stat: str) -> Optional[int]:
+        """1 + the number of users with a strictly greater stat, like the SQL ranking"""
+        value = self.value(user_id, stat)
+        if value is None:
+            return None
+        return self._lists[stat].bisect_left((-value, "")) + 1
+
+    def page(self, stat: str, offset: int, limit: int, descending: bool = True) -> list[str]:
+        """user_ids at positions offset..offset+limit of the ordered leaderboard"""
+        ordered = self._lists[stat]
+        if descending:
+            return [user_id for _, user_id in ordered[offset : offset + limit]]
+        end = len(ordered) - offset
+        return [user_id for _, user_id in reversed(ordered[max(0, end - limit) : max(0, end)])]
+
+    def around(self, user_id: str, stat: str, radius: int = 5) -> list[tuple[int, str]]:
+        """(position, user_id) for the users ranked just above and below a user"""
+        value = self.value(user_id, stat)
+        if value is None:
+            return []
+        ordered = self._lists[stat]
+        index = ordered.index((-value, user_id))
+        start = max(0, index - radius)
+        return [
+            (start + offset + 1, entry_user_id)
+            for offset, (_, entry_user_id) in enumerate(ordered[start : index + radius + 1])
+        ]
+
+    def stats(self) -> dict:
+        return {"ready": self.ready, "users": len(self._values)}
@@ -0,0 +1,141 @@
+from __future__ import annotations
+from array import array
+from typing import Optional
+import logging
+
+from models.game import User
+
+
+def ngrams(text: str, n: int) -> set[str]:
+    return {text[i : i + n] for i in range(len(text) - n + 1)}
+
+
+class UserSearchIndex:
+    """In-process n-gram index over usernames and display names.
+
+    Every bigram and trigram of both names maps to a compact posting list
+    of document ids. A query looks up the rarest of its own grams and only
+    checks those candidates for a real substring match, instead of a
+    leading-wildcard LIKE over the whole users table.
+
+    A renamed user gets a new document id and the old one is left dead in
+    the posting lists; the lists are compacted once dead entries outnumber
+    live ones.
+    """
+
+    MIN_QUERY = 2
+
+    def __init__(self) -> None:
+        self.logger = logging.getLogger(__name__)
+        self.ready = False
+        # doc id -> (user_id, username, display_name), lowercased; None once replaced
+        self._docs: list[Optional[tuple[str, str, str]]] = []
+        self._doc_of: dict[str, int] = {}
+        self._postings: dict[str, array] = {}
+        self._dead = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_of)
+
+    async def build(self) -> None:
+        rows = await User.all().values_list("user_id", "username", "display_name")
+        self._reset()
+        for user_id, username, display_name in rows:
+            self._insert(user_id, username, display_name)
+        self.ready = True
+        self.logger.info(f"Built search index for {len(self._doc_of)} users")
+
+    async def refresh(self, user_ids: list[str]) -> None:
+        """Reload a few users from the database, dropping the ones that are gone"""
+        rows = await User.filter(user_id__in=user_ids).values_list("user_id", "username", "display_name")
+        for user_id, username, display_name in rows:
+            self.add(user_id, username, display_name)
+        for user_id in set(user_ids) - {row[0] for row in rows}:
+            self.remove(user_id)
+
+    def add(self, user_id: str, username: str, display_name: str) -> None:
+        doc_id = self._doc_of.get(user_id)
+        if doc_id is not None:
+            _, old_username, old_display = self._docs[doc_id]  # type: ignore
+            if old_username == username.lower() and old_display == display_name.lower():
+                return
+            self._docs[doc_id] = None
+            self._dead += 1
+        self._insert(user_id, username, display_name)
+        self._maybe_compact()
+
+    def remove(self, user_id: str) -> None:
+        doc_id = self._doc_of.pop(user_id, None)
+        if doc_id is not None:
+            self._docs[doc_id] = None
+            self._dead += 1
+            self._maybe_compact()
+
+    def search(self, query: str, offset: int = 0, limit: int = 10) -> tuple[list[str], int]:
+        """Ranked user_ids for a query and the total number of matches.
+
+        Exact name matches come first, then prefix matches, then any other
+        substring match; ties are ordered by username.
+        """
+        query = query.strip().lower()
+        if len(query) < self.MIN_QUERY:
+            return [], 0
+        grams = ngrams(query, min(len(query), 3))
+        postings = [self._postings.get(gram) for gram in grams]
+        if not all(postings):
+            return [], 0
+        candidates = min(postings, key=len)  # type: ignore
+
+        matches = []
+        for doc_id in candidates:  # type: ignore
+            doc = self._docs[doc_id]
+            if doc is None:
+                continue
+            user_id, username, display_name = doc
+            if query not in username and query not in display_name:
+                continue
+            if query == username or query == display_name:
+                score = 0
+            elif username.startswith(query) or display_name.startswith(query):
+                score = 1
+            else:
+                score = 2
+            matches.append((score, username, user_id))
+        matches.sort()
+        return [user_id for _, _, user_id in matches[offset : offset + limit]], len(matches)
+
+    def _reset(self) -> None:
+        self._docs = []
+        self._doc_of = {}
+        self._postings = {}
+        self._dead = 0
+
+    def _insert(self, user_id: str, username: str, display_name: str) -> None:
+        doc_id = len(self._docs)
+        username, display_name = username.lower(), display_name.lower()
+        self._docs.append((user_id, username, display_name))
+        self._doc_of[user_id] = doc_id
+        grams: set[str] = set()
+        for name in (username, display_name):
+            grams |= ngrams(name, 2) | ngrams(name, 3)
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if posting is None:
+                posting = self._postings[gram] = array("I")
+            posting.append(doc_id)
+
+    def _maybe_compact(self) -> None:
+        if self._dead < 1000 or self._dead < len(self._doc_of):
+            return
+        live = [doc for doc in self._docs if doc is not None]
+        self._reset()
+        for user_id, username, display_name in live:
+            self._insert(user_id, username, display_name)
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "users": len(self._doc_of),
+            "dead_documents": self._dead,
+            "grams": len(self._postings),
+        }
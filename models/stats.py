@@ -0,0 +1,54 @@
+from __future__ import annotations
+from typing import Optional
+from tortoise.expressions import F
+from tortoise.transactions import in_transaction
+
+from models.game import User
+
+
+def derived_stats(games_won: int, games_lose: int, total_score: int) -> tuple[float, float]:
+    """win_rate (percent) and average_score over resolved games"""
+    total_resolved = games_won + games_lose
+    if total_resolved == 0:
+        return 0.0, 0.0
+    return (games_won / total_resolved) * 100, total_score / total_resolved
+
+
+async def record_games_started(user_ids: list[str]) -> None:
+    """Count a new game for every player in one UPDATE"""
+    if not user_ids:
+        return
+    await User.filter(user_id__in=user_ids).update(games_played=F("games_played") + 1)
+
+
+async def record_game_result(winner_id: str, loser_id: Optional[str] = None) -> None:
+    """Apply a finished game's win, loss and streak changes atomically.
+
+    Every change is an in-database increment inside one transaction, so
+    concurrent results for the same user can't overwrite each other.
+    """
+    async with in_transaction():
+        await User.filter(user_id=winner_id).update(
+            games_won=F("games_won") + 1,
+            total_score=F("total_score") + 1,
+            current_streak=F("current_streak") + 1,
+        )
+        await User.filter(user_id=winner_id, best_streak__lt=F("current_streak")).update(
+            best_streak=F("current_streak")
+        )
+        if loser_id:
+            await User.filter(user_id=loser_id).update(
+                current_streak=0,
+                games_lose=F("games_lose") + 1,
+            )
+        # The UPDATEs above hold the row locks, so these counters are current
+        rows = await User.filter(
+            user_id__in=[uid for uid in (winner_id, loser_id) if uid]
+        ).values("user_id", "games_won", "games_lose", "total_score")
+        for row in rows:
+            win_rate, average_score = derived_stats(
+                row["games_won"], row["games_lose"], row["total_score"]
+            )
+            await User.filter(user_id=row["user_id"]).update(
+                win_rate=win_rate, average_score=average_score
+            )
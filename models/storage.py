@@ -1,11 +1,17 @@
 from __future__ import annotations
-from typing import Optional, Tuple, BinaryIO
-from fastapi import HTTPException, UploadFile
+from typing import AsyncIterable, AsyncIterator, Optional, Tuple, BinaryIO
+from fastapi import HTTPException
 import boto3
 import logging
+import multiprocessing
 import uuid
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import AsyncExitStack
+from functools import partial
 from botocore.config import Config
 import mimetypes
 from mypy_boto3_s3.client import S3Client
@@ -14,6 +20,12 @@ from pathlib import Path
 from io import BytesIO
 from PIL import Image
 
+try:
+    from aiobotocore.config import AioConfig
+    from aiobotocore.session import get_session
+except ImportError:
+    AioConfig = None
+
 
 class StorageConfig:
     def __init__(
@@ -37,28 +49,110 @@ class StorageConfig:
         self.region_name = region_name or "auto"
 
 
+class ImageTooLarge(ValueError):
+    pass
+
+
+CONVERT_MP_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+
+def _open_image(data: bytes, max_pixels: int) -> Image.Image:
+    """Open an image, refusing it before decode if it has too many pixels.
+
+    The pixel count is checked from the header before any pixel data is
+    decoded, so decompression bombs are refused without being expanded.
+    """
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", Image.DecompressionBombWarning)
+        image = Image.open(BytesIO(data))
+    if image.width * image.height > max_pixels:
+        raise ImageTooLarge(f"{image.width}x{image.height} exceeds {max_pixels} pixels")
+    return image
+
+
+def _save_webp(image: Image.Image) -> bytes:
+    output = BytesIO()
+    # save as lossy webp at quality 85 (tweak as you like)
+    image.save(output, format="WEBP", quality=85)
+    return output.getvalue()
+
+
+def _encode_webp(data: bytes, max_pixels: int) -> bytes:
+    """Decode an image and re-encode it as WebP; runs in a worker process"""
+    return _save_webp(_open_image(data, max_pixels))
+
+
+def _encode_webp_variants(data: bytes, max_pixels: int, sizes: tuple[int, ...]) -> dict[int, bytes]:
+    """Decode an image once and encode a WebP fitting each size box.
+
+    JPEGs are decoded straight at a reduced scale when the largest size
+    allows it, and each smaller size is resized from the previous one.
+    """
+    image = _open_image(data, max_pixels)
+    largest = max(sizes)
+    image.draft("RGB", (largest, largest))
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if image.has_transparency_data else "RGB")
+    variants = {}
+    for size in sorted(sizes, reverse=True):
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+        variants[size] = _save_webp(image)
+    return variants
+
+
 class StorageManager:
     """Manages file storage operations using S3-compatible storage"""
 
-    def __init__(self, config: StorageConfig) -> None:
+    def __init__(
+        self,
+        config: StorageConfig,
+        convert_workers: int = 2,
+        convert_queue_limit: int = 16,
+        max_image_pixels: int = 40_000_000,
+        part_size: int = 8 * 1024 * 1024,
+        max_concurrency: int = 10,
+    ) -> None:
         self.logger = logging.getLogger(__name__)
         self.config = config
         self.s3_client: Optional[S3Client] = None
+        # One thread per pooled connection, so neither side queues behind the other
+        self.max_concurrency = max_concurrency
         self._upload_executor: ThreadPoolExecutor = ThreadPoolExecutor(
-            max_workers=10, thread_name_prefix="s3-upload"
+            max_workers=max_concurrency, thread_name_prefix="s3-upload"
         )
-        self._convertor_executor = ThreadPoolExecutor(max_workers=10)
+        # Image decoding/encoding holds the GIL, so it gets its own processes
+        self.convert_workers = convert_workers
+        self._convertor_executor = self._new_convertor_executor()
+        self.convert_queue_limit = convert_queue_limit
+        self.max_image_pixels = max_image_pixels
+        # S3 rejects multipart parts under 5 MiB (except the last one)
+        self.part_size = max(part_size, 5 * 1024 * 1024)
+        self.conversions_in_flight = 0
+        self.conversions = 0
+        self.conversions_rejected = 0
+        self.conversion_seconds = 0.0
+        self.pool_restarts = 0
         self._initialize_client()
 
+    def _client_options(self) -> dict:
+        return {
+            "retries": {'max_attempts': 3, 'mode': 'adaptive'},
+            "max_pool_connections": self.max_concurrency,
+            "connect_timeout": 10,
+            "read_timeout": 30,
+        }
+
+    @property
+    def ready(self) -> bool:
+        return self.s3_client is not None
+
     def _initialize_client(self) -> None:
         """Initialize the S3 client with optimized settings"""
         try:
-            config = Config(
-                retries={'max_attempts': 3, 'mode': 'adaptive'},
-                max_pool_connections=50,
-                connect_timeout=10,
-                read_timeout=30
-            )
+            config = Config(**self._client_options())
             self.s3_client = boto3.client(
                 "s3",
                 endpoint_url=self.config.endpoint,
@@ -71,15 +165,15 @@ class StorageManager:
             self.logger.error(f"Failed to initialize S3 client: {str(e)}")
             self.s3_client = None
 
-    async def upload_file(self, file: BytesIO, filename: str, prefix: str = "", unique_name: bool = True) -> Tuple[str, str, str, str]:
+    async def upload_file(self, file: BinaryIO, filename: str, prefix: str = "", unique_name: bool = True) -> Tuple[str, str, str, str]:
         """Upload a file to storage"""
-        if not self.s3_client:
+        if not self.ready:
             raise HTTPException(status_code=500, detail="Storage not initialized")
 
         try:
             unique_filename = f"{prefix}/{uuid.uuid4()}-{filename}" if unique_name else f"{prefix}/{filename}"
             file.seek(0)
-            await self._upload_fileobj(file, unique_filename)
+            await self.upload_stream(self._read_chunks(file), unique_filename)
             return (
                 f"{self.config.public_url}/{unique_filename}",
                 f"{self.config.endpoint}/{self.config.bucket_name}/{unique_filename}",
@@ -90,31 +184,79 @@ class StorageManager:
             self.logger.error(f"Failed to upload file: {str(e)}")
             raise HTTPException(status_code=500, detail="Failed to upload file")
 
-    async def _upload_fileobj(self, file: BinaryIO, key: str) -> None:
-        """Upload a file object to storage using a thread executor"""
-        if not self.s3_client:
-            raise HTTPException(status_code=500, detail="Storage not initialized")
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(self._upload_executor, self._sync_upload, file, key)
+    async def upload_stream(self, chunks: AsyncIterable[bytes], key: str) -> None:
+        """Upload a stream of bytes holding at most about one part in memory.
 
-    def _sync_upload(self, file: BinaryIO, key: str) -> None:
-        """Synchronous upload method"""
-        if not self.s3_client:
-            raise Exception("s3_client isn't initialized")
+        Objects smaller than part_size go up in a single PUT; anything larger
+        is sent as a multipart upload, one part at a time, and aborted if
+        the stream or a part fails.
+        """
+        if not self.ready:
+            raise HTTPException(status_code=500, detail="Storage not initialized")
+        buffer = bytearray()
+        upload_id: Optional[str] = None
+        parts: list[dict] = []
         try:
-            self.s3_client.upload_fileobj(
-                file,
-                self.config.bucket_name,
-                key,
-                ExtraArgs={
-                    'ContentType': self._get_content_type(key),
-                    'ACL': 'public-read'
-                }
+            async for chunk in chunks:
+                buffer += chunk
+                while len(buffer) >= self.part_size:
+                    if upload_id is None:
+                        upload_id = await self._create_multipart(key)
+                    part = bytes(buffer[: self.part_size])
+                    del buffer[: self.part_size]
+                    parts.append(await self._upload_part(key, upload_id, len(parts) + 1, part))
+            if upload_id is None:
+                await self._call(
+                    "put_object",
+                    Key=key,
+                    Body=bytes(buffer),
+                    ContentType=self._get_content_type(key),
+                    ACL="public-read",
+                )
+                return
+            if buffer:
+                parts.append(await self._upload_part(key, upload_id, len(parts) + 1, bytes(buffer)))
+            await self._call(
+                "complete_multipart_upload",
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
             )
-        except Exception as e:
-            self.logger.error(f"S3 upload failed: {str(e)}")
+        except BaseException:
+            if upload_id is not None:
+                try:
+                    await self._call("abort_multipart_upload", Key=key, UploadId=upload_id)
+                except Exception as e:
+                    self.logger.warning(f"Failed to abort multipart upload of {key}: {str(e)}")
             raise
 
+    async def _read_chunks(self, file: BinaryIO) -> AsyncIterator[bytes]:
+        while chunk := file.read(self.part_size):
+            yield chunk
+
+    async def _create_multipart(self, key: str) -> str:
+        response = await self._call(
+            "create_multipart_upload",
+            Key=key,
+            ContentType=self._get_content_type(key),
+            ACL="public-read",
+        )
+        return response["UploadId"]
+
+    async def _upload_part(self, key: str, upload_id: str, part_number: int, body: bytes) -> dict:
+        response = await self._call(
+            "upload_part", Key=key, UploadId=upload_id, PartNumber=part_number, Body=body
+        )
+        return {"ETag": response["ETag"], "PartNumber": part_number}
+
+    async def _call(self, operation: str, **kwargs) -> dict:
+        """Run one blocking S3 API call on the upload thread pool"""
+        method = getattr(self.s3_client, operation)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._upload_executor, partial(method, Bucket=self.config.bucket_name, **kwargs)
+        )
+
     def _get_content_type(self, filename: str) -> str:
         """Determine content type using mimetypes"""
         content_type = mimetypes.guess_type(filename)[0]
@@ -122,25 +264,88 @@ class StorageManager:
 
     async def delete_file(self, filename: str) -> None:
         """Delete a file from storage asynchronously"""
-        if not self.s3_client:
+        if not self.ready:
             raise HTTPException(status_code=500, detail="Storage not initialized")
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(self._upload_executor, self._sync_delete, filename)
-
-    def _sync_delete(self, filename: str) -> None:
-        """Synchronous delete helper"""
-        if not self.s3_client:
-            raise Exception("s3_client isn't initialized")
         try:
-            self.s3_client.delete_object(Bucket=self.config.bucket_name, Key=filename)
+            await self._call("delete_object", Key=filename)
         except Exception as e:
             self.logger.error(f"Failed to delete file: {str(e)}")
             raise
 
-    async def __aenter__(self):
-        return self
+    async def convert_to_webp(self, data: bytes) -> BytesIO:
+        """Convert an uploaded image to WebP in the conversion process pool"""
+        return BytesIO(await self._convert(data, _encode_webp))
 
-    async def __aexit__(self, exc_type, exc_val, exc_tb):
+    async def convert_to_webp_variants(self, data: bytes, sizes: tuple[int, ...]) -> dict[int, BytesIO]:
+        """Convert an uploaded image to one WebP per size from a single decode"""
+        variants = await self._convert(data, _encode_webp_variants, sizes)
+        return {size: BytesIO(webp) for size, webp in variants.items()}
+
+    async def _convert(self, data: bytes, encode, *args):
+        if self.conversions_in_flight >= self.convert_queue_limit:
+            self.conversions_rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Server is busy, please try again",
+                headers={"Retry-After": "1"},
+            )
+        self.conversions_in_flight += 1
+        try:
+            started = time.perf_counter()
+            loop = asyncio.get_running_loop()
+            executor = self._convertor_executor
+            result = await loop.run_in_executor(
+                executor, encode, data, self.max_image_pixels, *args
+            )
+        except (ImageTooLarge, Image.DecompressionBombError, Image.DecompressionBombWarning) as e:
+            raise HTTPException(status_code=413, detail=f"Image too large: {e}")
+        except BrokenProcessPool:
+            # A worker died (OOM, decoder crash); the pool is unusable until replaced
+            self._replace_convertor_executor(executor)
+            raise HTTPException(
+                status_code=503,
+                detail="Image processing restarted, please try again",
+                headers={"Retry-After": "1"},
+            )
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Image conversion failed: {e}")
+        finally:
+            self.conversions_in_flight -= 1
+        elapsed = time.perf_counter() - started
+        self.conversions += 1
+        self.conversion_seconds += elapsed
+        self.logger.debug(f"Converted {len(data)} byte upload to WebP in {elapsed * 1000:.1f} ms")
+        return result
+
+    def _new_convertor_executor(self) -> ProcessPoolExecutor:
+        # The pool starts its processes lazily, once the server already runs threads
+        # (S3, SMTP, password hashing); forking then can deadlock a child on an
+        # inherited lock, so they come from a clean forkserver process instead
+        return ProcessPoolExecutor(max_workers=self.convert_workers, mp_context=CONVERT_MP_CONTEXT)
+
+    def _replace_convertor_executor(self, broken: ProcessPoolExecutor) -> None:
+        if self._convertor_executor is not broken:
+            return  # already replaced by another failed conversion
+        self.logger.error("Image conversion pool broke, starting a new one")
+        self._convertor_executor = self._new_convertor_executor()
+        broken.shutdown(wait=False)
+        self.pool_restarts += 1
+
+    def stats(self) -> dict:
+        return {
+            "conversions": self.conversions,
+            "pool_restarts": self.pool_restarts,
+            "conversions_in_flight": self.conversions_in_flight,
+            "conversions_rejected": self.conversions_rejected,
+            "average_conversion_ms": (
+                self.conversion_seconds / self.conversions * 1000 if self.conversions else 0.0
+            ),
+        }
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
         if self.s3_client:
             # Close S3 client if boto3 supports it
             try:
@@ -149,17 +354,58 @@ class StorageManager:
                 pass
             self.s3_client = None
         self._upload_executor.shutdown(wait=True)
+        self._convertor_executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+
+class AsyncStorageManager(StorageManager):
+    """StorageManager on a native asyncio S3 client (aiobotocore).
+
+    S3 calls run on the event loop instead of a thread pool; at most
+    max_concurrency are in flight, matching the client's connection pool.
+    The client is opened by start() and closed by stop().
+    """
+
+    def __init__(self, config: StorageConfig, **kwargs) -> None:
+        if AioConfig is None:
+            raise RuntimeError("aiobotocore is required for the async storage backend")
+        super().__init__(config, **kwargs)
+        self._client = None
+        self._client_stack = AsyncExitStack()
+        self._limit = asyncio.Semaphore(self.max_concurrency)
+
+    def _initialize_client(self) -> None:
+        pass
+
+    @property
+    def ready(self) -> bool:
+        return self._client is not None
+
+    async def start(self) -> None:
+        if self._client is not None:
+            return
+        self._client = await self._client_stack.enter_async_context(
+            get_session().create_client(
+                "s3",
+                endpoint_url=self.config.endpoint,
+                aws_access_key_id=self.config.access_key,
+                aws_secret_access_key=self.config.secret_key,
+                region_name=self.config.region_name,
+                config=AioConfig(**self._client_options()),
+            )
+        )
+
+    async def stop(self) -> None:
+        await self._client_stack.aclose()
+        self._client = None
+        await super().stop()
 
-async def convert_to_webp(file: UploadFile) -> BytesIO:
-    """Convert any uploaded image to WebP in memory"""
-    try:
-        image = Image.open(file.file)
-        output = BytesIO()
-        # save as lossy webp at quality 85 (tweak as you like)
-        image.save(output, format="WEBP", quality=85)
-        output.seek(0)
-        return output
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Image conversion failed: {e}")
-    
-# webp_bytes = await loop.run_in_executor(executor, convert_to_webp, file_path)
\ No newline at end of file
+    async def _call(self, operation: str, **kwargs) -> dict:
+        async with self._limit:
+            return await getattr(self._client, operation)(Bucket=self.config.bucket_name, **kwargs)
@@ -0,0 +1,183 @@
+"""RedisLobbyBackend between two workers, run offline against fakeredis.
+
+Each test hands two backends their own client on one fakeredis server,
+the same way two uvicorn workers share a Redis.
+"""
+import asyncio
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")  # fakeredis needs it for EVAL
+
+from models.backend import RedisLobbyBackend
+
+
+class Worker:
+    def __init__(self, server) -> None:
+        self.backend = RedisLobbyBackend(fakeredis.aioredis.FakeRedis(server=server))
+        self.events: list[dict] = []
+        self.lobbies: dict = {}
+        # Cleared to hold the worker's event listener inside the handler
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def start(self) -> None:
+        self.lobbies = await self.backend.start(self.handle)
+
+    async def handle(self, event: dict) -> None:
+        self.events.append(event)
+        await self.gate.wait()
+
+    def kinds(self) -> list[str]:
+        return [event["kind"] for event in self.events]
+
+
+async def settle() -> None:
+    for _ in range(10):
+        await asyncio.sleep(0.01)
+
+
+async def hold(worker: Worker, sender: Worker) -> None:
+    """Park a worker's listener on a relay so later events queue up until its gate is set"""
+    worker.gate.clear()
+    await sender.backend.relay_lobby("hold", "{}", [])
+    await settle()
+
+
+def run_workers(test):
+    """Run test(a, b, server) with two started workers on a fresh server"""
+
+    async def main():
+        server = fakeredis.FakeServer()
+        a, b = Worker(server), Worker(server)
+        await a.start()
+        await b.start()
+        try:
+            await test(a, b, server)
+        finally:
+            await a.backend.stop()
+            await b.backend.stop()
+
+    asyncio.run(main())
+
+
+LOBBY = {"lobby_id": "l1", "owner": "u1", "second_player": "u2"}
+PLAYER = {"user_id": "u1", "is_ready": False, "character": None}
+
+
+def test_lobby_is_mirrored_and_loaded_at_startup():
+    async def test(a, b, server):
+        assert await a.backend.save_lobby("l1", {"lobby": LOBBY, "player:u1": PLAYER}, create=True)
+        await settle()
+        assert a.events == []
+        assert b.kinds() == ["lobby"]
+        assert b.events[0]["parts"] == {"lobby": LOBBY, "player:u1": PLAYER}
+        assert b.events[0]["stale"] is False
+
+        c = Worker(server)
+        await c.start()
+        assert c.lobbies == {"l1": {"lobby": [1, LOBBY], "player:u1": [1, PLAYER]}}
+        await c.backend.stop()
+
+    run_workers(test)
+
+
+def test_concurrent_changes_to_different_players_merge():
+    async def test(a, b, server):
+        parts = {"lobby": LOBBY, "player:u1": PLAYER, "player:u2": {**PLAYER, "user_id": "u2"}}
+        await a.backend.save_lobby("l1", parts, create=True)
+        await settle()
+        # Both players press ready on their own worker before seeing the other
+        await hold(a, b)
+        await hold(b, a)
+        await a.backend.save_lobby("l1", {"player:u1": {**PLAYER, "is_ready": True}})
+        await b.backend.save_lobby("l1", {"player:u2": {**PLAYER, "user_id": "u2", "is_ready": True}})
+        a.gate.set()
+        b.gate.set()
+        await settle()
+        assert a.events[-1]["parts"] == {"player:u2": {**PLAYER, "user_id": "u2", "is_ready": True}}
+        assert b.events[-1]["parts"] == {"player:u1": {**PLAYER, "is_ready": True}}
+        # Each sender's broadcast missed the other's change
+        assert a.events[-1]["stale"] and b.events[-1]["stale"]
+        assert a.backend.versions == b.backend.versions
+
+    run_workers(test)
+
+
+def test_older_part_is_ignored_whatever_the_arrival_order():
+    async def test(a, b, server):
+        await a.backend.save_lobby("l1", {"lobby": LOBBY}, create=True)
+        await settle()
+        # a's change only reaches b after b wrote its own
+        await hold(b, a)
+        await a.backend.save_lobby("l1", {"lobby": {**LOBBY, "user_turn": "u1"}})
+        await b.backend.save_lobby("l1", {"lobby": {**LOBBY, "user_turn": "u2"}})
+        b.gate.set()
+        await settle()
+        assert b.kinds() == ["lobby", "relay", "lobby"]
+        assert b.events[-1]["parts"] == {}
+        assert a.events[-1]["parts"] == {"lobby": {**LOBBY, "user_turn": "u2"}}
+        assert a.backend.versions["l1"]["lobby"] == b.backend.versions["l1"]["lobby"] == 3
+
+    run_workers(test)
+
+
+def test_delete_is_relayed_and_blocks_late_writes():
+    async def test(a, b, server):
+        await a.backend.save_lobby("l1", {"lobby": LOBBY}, create=True)
+        await settle()
+        await a.backend.delete_lobby("l1")
+        await settle()
+        assert b.kinds() == ["lobby", "lobby_deleted"]
+        assert "l1" not in b.backend.versions
+        assert not await b.backend.save_lobby("l1", {"player:u2": PLAYER})
+        c = Worker(server)
+        await c.start()
+        assert c.lobbies == {}
+        await c.backend.stop()
+
+    run_workers(test)
+
+
+def test_relays_reach_only_other_workers():
+    async def test(a, b, server):
+        await a.backend.relay_lobby("l1", '{"type":"chat_message"}', ["u1"])
+        await b.backend.relay_user("u1", '{"type":"kicked"}', kick=True)
+        await settle()
+        assert a.kinds() == ["user"] and a.events[0]["kick"] is True
+        assert b.kinds() == ["relay"]
+        assert b.events[0]["payload"] == '{"type":"chat_message"}'
+        assert b.events[0]["exclude"] == ["u1"]
+
+    run_workers(test)
+
+
+def test_presence_lease_claim_renew_expire_release():
+    async def test(a, b, server):
+        assert await a.backend.claim_presence("u1", "session-a", 0.2)
+        assert not await b.backend.claim_presence("u1", "session-b", 0.2)
+        assert await a.backend.renew_presence("u1", "session-a", 0.2)
+        assert await b.backend.live_presence(["u1", "u2"]) == {"u1"}
+
+        await asyncio.sleep(0.3)
+        assert await b.backend.live_presence(["u1"]) == set()
+        assert await b.backend.claim_presence("u1", "session-b", 10)
+        assert not await a.backend.renew_presence("u1", "session-a", 10)
+
+        await a.backend.release_presence("u1", "session-a")
+        assert await a.backend.live_presence(["u1"]) == {"u1"}
+        await b.backend.release_presence("u1", "session-b")
+        assert await a.backend.live_presence(["u1"]) == set()
+
+    run_workers(test)
+
+
+def test_worker_lease_ends_when_a_worker_stops():
+    async def test(a, b, server):
+        workers = [a.backend.worker_id, b.backend.worker_id, "gone"]
+        assert await a.backend.live_workers(workers) == set(workers[:2])
+        await b.backend.stop()
+        assert await a.backend.live_workers(workers) == {a.backend.worker_id}
+
+    run_workers(test)